@@ -0,0 +1,102 @@
+from pathlib import Path
+from typing import Optional
+
+import pygame as pg
+
+# The default directory of image resources.
+RES_PATH: Path = Path(__file__).parent.joinpath("res")
+
+# The sprite names and their image files.
+SPRITES: dict[str, str] = {
+    # Agent.
+    "agent": "star.png",
+
+    # Enemies.
+    "boy": "boy.png",
+    "cat girl": "cat-girl.png",
+    "horn girl": "horn-girl.png",
+    "pink girl": "pink-girl.png",
+    "princess": "princess.png",
+
+    # Terrains.
+    "plain": "plain.png",
+    "grass": "grass.png",
+    "plain path": "plain-path.png",
+    "grass path": "grass-path.png",
+    "bush": "bush.png",
+    "stone wall": "stone-wall.png",
+    "wooden wall": "wooden-wall.png"
+}
+
+
+class Atlas:
+    """
+    Sprites packed into one surface, which is loaded on first use.
+    The surface is converted to the pixel format of the display once, so blitting sprites needs no conversion.
+    Sprites scaled for each zoom level are cached.
+    """
+    # The maximum width of the packed surface.
+    _MAX_WIDTH: int = 1024
+
+    def __init__(self, path: Path = RES_PATH) -> None:
+        """
+        The constructor.
+
+        -- PARAMETERS --
+        path: The directory of image files.
+        """
+        self._path: Path = path
+        self._surface: Optional[pg.Surface] = None
+
+        # The sprites of each zoom level.
+        self._sprites: dict[float, dict[str, pg.Surface]] = {}
+
+    @property
+    def loaded(self) -> bool:
+        return self._surface is not None
+
+    def sprites(self, zoom: float = 1) -> dict[str, pg.Surface]:
+        """
+        Get all sprites scaled by a zoom level.
+        A display mode should have been set, otherwise sprites are not converted.
+        """
+        if zoom <= 0:
+            raise ValueError("Invalid zoom level.")
+        sprites = self._sprites.get(zoom)
+        if sprites is None:
+            if zoom == 1:
+                sprites = self._load()
+            else:
+                sprites = {name: pg.transform.smoothscale(sprite, _scale(sprite.get_size(), zoom))
+                           for name, sprite in self.sprites().items()}
+            self._sprites[zoom] = sprites
+        return sprites
+
+    def _load(self) -> dict[str, pg.Surface]:
+        """
+        Load images and pack them into rows of a surface.
+        """
+        images = {name: pg.image.load(str(self._path.joinpath(file))) for name, file in SPRITES.items()}
+
+        # Place the tallest images first, so each row wastes less space.
+        rects: dict[str, pg.Rect] = {}
+        x, y, row_height, width = 0, 0, 0, 0
+        for name, image in sorted(images.items(), key=lambda item: item[1].get_height(), reverse=True):
+            if x > 0 and x + image.get_width() > self._MAX_WIDTH:
+                x, y, row_height = 0, y + row_height, 0
+            rects[name] = pg.Rect((x, y), image.get_size())
+            x += image.get_width()
+            row_height = max(row_height, image.get_height())
+            width = max(width, x)
+
+        surface = pg.Surface((width, y + row_height), pg.SRCALPHA)
+        for name, image in images.items():
+            surface.blit(image, rects[name])
+        if pg.display.get_surface() is not None:
+            surface = surface.convert_alpha()
+        self._surface = surface
+        return {name: surface.subsurface(rect) for name, rect in rects.items()}
+
+
+def _scale(size: tuple[int, int], zoom: float) -> tuple[int, int]:
+    return max(round(size[0] * zoom), 1), max(round(size[1] * zoom), 1)
@@ -0,0 +1,210 @@
+import argparse
+import logging
+import multiprocessing as mp
+import sys
+import time
+from collections.abc import Callable, Iterable, Iterator
+from pathlib import Path
+from typing import Optional, TypeVar
+
+import game.autotune as autotune
+from config import Config, DEFAULT_PATH
+from corpus import MapCorpus
+from game.map import Map
+from simulation import GameResult, play_seed
+from stats import Aggregator, MetricsServer, Reporter
+
+# The types of jobs and results of functions run by workers.
+T = TypeVar("T")
+R = TypeVar("R")
+
+# The strategy weights of a role as hashable pairs of strategy names and weights.
+Weights = tuple[tuple[str, float], ...]
+
+# The configuration of a worker process, loaded once when it starts.
+_worker_cfg: Optional[Config] = None
+
+# The shared map corpus attached by a worker process and its read-only map views.
+_worker_corpus: Optional[MapCorpus] = None
+_worker_maps: Optional[list[Map]] = None
+
+# The configurations with different strategy weights used by a worker process.
+_worker_weighted: dict[tuple[str, Weights], Config] = {}
+
+# The maximum number of cached configurations with different strategy weights.
+_MAX_WEIGHTED: int = 256
+
+
+def _init_worker(cfg_path: Path, corpus: Optional[str]) -> None:
+    global _worker_cfg, _worker_corpus, _worker_maps
+    _worker_cfg = Config.load(cfg_path)
+    if corpus is not None:
+        _worker_corpus = MapCorpus.attach(corpus)
+        _worker_maps = _worker_corpus.maps(_worker_cfg)
+
+
+def _play(game_seed: int) -> GameResult:
+    return play_seed(_worker_cfg, game_seed, _worker_maps)
+
+
+def _play_stats(seeds: range) -> Aggregator:
+    stats = Aggregator()
+    for game_seed in seeds:
+        stats.add(_worker_cfg, play_seed(_worker_cfg, game_seed, _worker_maps))
+    return stats
+
+
+def _play_weighted(job: tuple[int, str, Weights, int]) -> tuple[int, GameResult]:
+    index, role, weights, game_seed = job
+    cfg = _worker_weighted.get((role, weights))
+    if cfg is None:
+        if len(_worker_weighted) >= _MAX_WEIGHTED:
+            _worker_weighted.clear()
+        cfg = _worker_cfg.with_strategy_weights(role, dict(weights))
+        _worker_weighted[(role, weights)] = cfg
+    return index, play_seed(cfg, game_seed, _worker_maps)
+
+
+class WorkerPool:
+    """
+    A pool of worker processes playing games without displaying them.
+    Workers are forked from a server process that has imported the game modules once,
+    and each of them serves many games, so a game does not pay for imports or configuration loading.
+    """
+    # The modules imported by the fork server before forking workers.
+    _PRELOAD: list[str] = ["config", "corpus", "simulation", "stats", "game.autotune", "game.kernels", "game.map",
+                           "game.role", "game.strategy", "game.warmup"]
+
+    def __init__(self, processes: Optional[int] = None, cfg_path: Path = DEFAULT_PATH,
+                 corpus: Optional[str] = None) -> None:
+        """
+        The constructor.
+
+        -- PARAMETERS --
+        processes: The number of worker processes. `None` means the number of CPUs.
+        cfg_path: The configuration file loaded by workers.
+        corpus: The name of a shared map corpus. Games will be played on its maps instead of random ones.
+        """
+        # Calibrate the automatic planner before workers start, instead of in every worker under load.
+        autotune.prepare(Config.load(cfg_path))
+        if "forkserver" in mp.get_all_start_methods():
+            ctx = mp.get_context("forkserver")
+            ctx.set_forkserver_preload(self._PRELOAD)
+        else:
+            ctx = mp.get_context("spawn")
+        self._pool = ctx.Pool(processes, initializer=_init_worker, initargs=(cfg_path, corpus))
+
+    def __enter__(self) -> 'WorkerPool':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def play(self, seeds: Iterable[int], chunk_size: int = 1) -> Iterator[GameResult]:
+        """
+        Play a game for each random seed. Results are yielded in the order they finish.
+        """
+        return self._pool.imap_unordered(_play, seeds, chunk_size)
+
+    def play_stats(self, seeds: range, chunk_size: int = 100) -> Iterator[Aggregator]:
+        """
+        Play a game for each random seed and summarize them.
+        Each job plays a chunk of games and yields only their summaries, which can be merged in any order.
+        """
+        if chunk_size <= 0:
+            raise ValueError("Invalid chunk size.")
+        chunks = (seeds[i:i + chunk_size] for i in range(0, len(seeds), chunk_size))
+        return self._pool.imap_unordered(_play_stats, chunks)
+
+    def play_weighted(self, jobs: Iterable[tuple[int, str, Weights, int]],
+                      chunk_size: int = 1) -> Iterator[tuple[int, GameResult]]:
+        """
+        Play games with different strategy weights of a role.
+        Each job is a caller-defined index, the role, its strategy weights and a random seed.
+        Results are yielded with their indices in the order they finish.
+        """
+        return self._pool.imap_unordered(_play_weighted, jobs, chunk_size)
+
+    def run(self, func: Callable[[T], R], jobs: Iterable[T], chunk_size: int = 1) -> Iterator[R]:
+        """
+        Run a module-level function on each job. Results are yielded in the order of jobs.
+        """
+        return self._pool.imap(func, jobs, chunk_size)
+
+    def close(self) -> None:
+        """
+        Wait for all games to finish and stop workers.
+        """
+        self._pool.close()
+        self._pool.join()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Play games in parallel without displaying them.")
+    parser.add_argument("--config", type=Path, default=DEFAULT_PATH, help="The configuration file.")
+    parser.add_argument("--games", type=int, default=100, help="The number of games.")
+    parser.add_argument("--seed", type=int, default=0, help="The random seed of the first game.")
+    parser.add_argument("--processes", type=int, default=None, help="The number of worker processes.")
+    parser.add_argument("--corpus", type=int, default=0,
+                        help="The number of maps generated into shared memory and used by all workers. "
+                             "Zero means every game generates its own map.")
+    parser.add_argument("--chunk", type=int, default=100,
+                        help="The number of games played by a job, whose statistics are merged at once.")
+    parser.add_argument("--stats", type=Path, default=None,
+                        help="The JSON file that statistics are periodically flushed to.")
+    parser.add_argument("--flush-interval", type=float, default=10, help="The number of seconds between flushes.")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Serve plain-text metrics on a local port while the games are running.")
+    args = parser.parse_args()
+    if args.games < 1:
+        parser.error("The number of games should be positive.")
+    if args.chunk < 1:
+        parser.error("The chunk size should be positive.")
+
+    corpus = MapCorpus.create(Config.load(args.config), args.corpus) if args.corpus > 0 else None
+    try:
+        run(args, corpus.name if corpus else None)
+    finally:
+        if corpus:
+            corpus.close()
+
+
+def run(args: argparse.Namespace, corpus: Optional[str]) -> None:
+    metrics = MetricsServer(args.metrics_port) if args.metrics_port is not None else None
+    reporter = Reporter(args.stats, args.flush_interval, metrics)
+    try:
+        begin = time.perf_counter()
+        with WorkerPool(args.processes, args.config, corpus) as pool:
+            ready = time.perf_counter()
+            first = None
+            for partial in pool.play_stats(range(args.seed, args.seed + args.games), args.chunk):
+                now = time.perf_counter()
+                if first is None:
+                    first = now
+                reporter.merge(partial, now)
+        end = time.perf_counter()
+        reporter.publish()
+    finally:
+        if metrics:
+            metrics.close()
+
+    for key, stats in reporter.stats.to_dict().items():
+        print(f"{key}")
+        print(f"Games: {stats['games']}, Stuck: {stats['stuck']}, "
+              f"Mean Score: {stats['score']['mean']:.2f} (SD {stats['score']['stdev']:.2f}), "
+              f"Median Score: {stats['scoreQuantiles']['0.5']:.0f}")
+    print(f"Pool Startup: {(ready - begin) * 1000:.1f} ms, First Chunk: {(first - ready) * 1000:.1f} ms, "
+          f"Total: {end - begin:.2f} s")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger(__name__)
+
+    try:
+        main()
+    except SystemExit:
+        raise
+    except BaseException as err:
+        logger.exception(err)
+        sys.exit(1)
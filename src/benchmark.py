@@ -0,0 +1,237 @@
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+from random import seed
+
+import game.autotune as autotune
+import game.strategy as sg
+from config import Config, DEFAULT_PATH
+from game import kernels
+from game.action import Action
+from game.map import Map, Status
+from simulation import create_map, create_roles, next_step
+
+
+def random_map(cfg: Config, width: int, height: int) -> Map:
+    """
+    Create a map with a fixed size, or a map with the configured size if the size is zero.
+    """
+    if width <= 0 or height <= 0:
+        return create_map(cfg)
+    while True:
+        map = Map(width, height, cfg)
+        if map.blank_count() >= 2:
+            return map
+
+
+def bench_planners(args: argparse.Namespace) -> None:
+    """
+    Compare the number of positions expanded by unidirectional and bidirectional A* search and jump point search.
+    All searches run on the same game states, which are collected by playing games with the configured strategies.
+    """
+    cfg = Config.load(args.config)
+    planners = ("unidirectional", "bidirectional", "jps")
+    expanded = {name: 0 for name in planners}
+    elapsed = {name: 0.0 for name in planners}
+    searches, diffs = 0, 0
+    for i in range(args.games):
+        seed(args.seed + i)
+        status = Status(cfg)
+        create_roles(status, random_map(cfg, args.width, args.height))
+        probes = {name: sg.AStar(status.enemy) for name in planners[:2]}
+        probes["unidirectional"].bidirectional = False
+        probes["bidirectional"].bidirectional = True
+        probes["jps"] = sg.JumpPointSearch(status.enemy)
+
+        move_enemy = False
+        while not status.game_end:
+            if move_enemy:
+                costs = set()
+                for name, probe in probes.items():
+                    begin = time.perf_counter()
+                    path = probe._path(status)
+                    elapsed[name] += time.perf_counter() - begin
+                    expanded[name] += probe.expanded
+                    costs.add(sum(probe._step_cost(*pos) for pos in path[1:]))
+                searches += 1
+                diffs += len(costs) > 1
+            next_step(status, move_enemy)
+            if move_enemy:
+                # Probes are not strategies of the enemy, so they are notified of its discoveries here.
+                for probe in probes.values():
+                    probe.on_reveal(status.enemy.new_reveals)
+            move_enemy = not move_enemy
+
+    print(f"{args.games} games, {searches} searches, {diffs} searches with different path costs.")
+    print(f"{'Planner':<16}{'Expanded/Search':>18}{'Time/Search (ms)':>20}")
+    for name in planners:
+        print(f"{name:<16}{expanded[name] / max(searches, 1):>18.1f}{elapsed[name] / max(searches, 1) * 1000:>20.3f}")
+
+
+def bench_kernels(args: argparse.Namespace) -> None:
+    """
+    Compare compiled kernels with their pure-Python code on the same game states.
+    """
+    if not kernels.AVAILABLE:
+        raise RuntimeError("Compiled kernels require Numba.")
+
+    cfg = Config.load(args.config)
+    names = ("aStar", "wallDensity")
+    elapsed = {(name, jit): 0.0 for name in names for jit in (False, True)}
+    calls, diffs = 0, 0
+    for i in range(args.games):
+        seed(args.seed + i)
+        status = Status(cfg)
+        create_roles(status, random_map(cfg, args.width, args.height))
+        path_finder, density = sg.AStar(status.enemy), sg.WallDensity(status.enemy)
+        path_finder.bidirectional = False
+
+        move_enemy = False
+        while not status.game_end:
+            if move_enemy:
+                results = []
+                for jit in (False, True):
+                    path_finder.jit = density.jit = jit
+                    begin = time.perf_counter()
+                    path = path_finder._path(status)
+                    elapsed[("aStar", jit)] += time.perf_counter() - begin
+                    begin = time.perf_counter()
+                    lvls = [density._density(action) for action in Action]
+                    elapsed[("wallDensity", jit)] += time.perf_counter() - begin
+                    results.append((path, lvls))
+                calls += 1
+                diffs += results[0] != results[1]
+            next_step(status, move_enemy)
+            move_enemy = not move_enemy
+
+    print(f"{args.games} games, {calls} calls, {diffs} calls with different results.")
+    print(f"{'Kernel':<16}{'Python (ms)':>14}{'Compiled (ms)':>16}{'Speedup':>10}")
+    for name in names:
+        python, compiled = elapsed[(name, False)] / max(calls, 1), elapsed[(name, True)] / max(calls, 1)
+        print(f"{name:<16}{python * 1000:>14.3f}{compiled * 1000:>16.3f}{python / compiled:>10.1f}")
+
+
+def bench_sprites(args: argparse.Namespace) -> None:
+    """
+    Compare loading and blitting separate unconverted images with a converted sprite atlas.
+    """
+    import os
+    import pygame as pg
+    from assets import RES_PATH, SPRITES, Atlas
+
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pg.display.init()
+    target = pg.display.set_mode((800, 600))
+
+    begin = time.perf_counter()
+    images = {name: pg.image.load(str(RES_PATH.joinpath(file))) for name, file in SPRITES.items()}
+    loads = {"separate": time.perf_counter() - begin}
+    begin = time.perf_counter()
+    atlas = Atlas().sprites()
+    loads["atlas"] = time.perf_counter() - begin
+
+    blits = 20000
+    print(f"{'Sprites':<12}{'Load (ms)':>12}{'Blits/s':>14}")
+    for name, sprites in (("separate", images), ("atlas", atlas)):
+        sprites = list(sprites.values())
+        begin = time.perf_counter()
+        for i in range(blits):
+            target.blit(sprites[i % len(sprites)], ((i * 50) % 750, (i * 40) % 515))
+        rate = blits / (time.perf_counter() - begin)
+        print(f"{name:<12}{loads[name] * 1000:>12.2f}{rate:>14.0f}")
+    pg.quit()
+
+
+def bench_memory(args: argparse.Namespace) -> None:
+    """
+    Measure the memory held by live games with tracemalloc, including their maps.
+    Each game plays some steps first, so strategies have allocated their caches.
+    """
+    import gc
+    import tracemalloc
+
+    cfg = Config.load(args.config)
+
+    def new_game(index: int) -> Status:
+        seed(args.seed + index)
+        status = Status(cfg)
+        create_roles(status, random_map(cfg, args.width, args.height))
+        move_enemy = False
+        for _ in range(args.steps):
+            if status.game_end:
+                break
+            next_step(status, move_enemy)
+            move_enemy = not move_enemy
+        return status
+
+    # Warm up caches shared by all games, such as compiled kernels and vision tables.
+    new_game(-1)
+    gc.collect()
+    tracemalloc.start()
+    begin = tracemalloc.take_snapshot()
+    games = [new_game(i) for i in range(args.games)]
+    gc.collect()
+    end = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    stats = end.compare_to(begin, "lineno")
+    per_game = sum(stat.size_diff for stat in stats) / len(games)
+    print(f"{len(games)} games, {args.steps} steps each, {per_game:.0f} bytes per game, "
+          f"{per_game * 100000 / 2 ** 30:.2f} GiB per 100k games.")
+    print(f"{'Bytes/Game':>12}  Allocation")
+    for stat in stats[:args.top]:
+        frame = stat.traceback[0]
+        print(f"{stat.size_diff / len(games):>12.0f}  {Path(frame.filename).name}:{frame.lineno}")
+
+
+def calibrate(args: argparse.Namespace) -> None:
+    """
+    Calibrate planners for the automatic choice again and print the mean time of a search on each calibration map.
+    """
+    cfg = Config.load(args.config)
+    points = autotune.calibration(cfg, cfg.vision_radius("enemy"), force=True)
+    print(f"{'Map':<16}" + "".join(f"{name:>16}" for name in autotune.PLANNERS))
+    for point in points:
+        label = f"{point.size}x{point.size} {point.wall:.0%}/{point.bush:.0%}"
+        print(f"{label:<16}" + "".join(f"{point.times[name]:>16.3f}" for name in autotune.PLANNERS))
+    print(f"Search times in milliseconds, cached in '{autotune.CACHE_PATH}'.")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks of Chase AI.")
+    parser.add_argument("--config", type=Path, default=DEFAULT_PATH, help="The configuration file.")
+    parser.add_argument("--games", type=int, default=20, help="The number of games.")
+    parser.add_argument("--seed", type=int, default=0, help="The random seed of the first game.")
+    parser.add_argument("--width", type=int, default=0, help="The map width. Zero means the configured size.")
+    parser.add_argument("--height", type=int, default=0, help="The map height. Zero means the configured size.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("planners", help="Compare A* search and jump point search.") \
+        .set_defaults(func=bench_planners)
+    subparsers.add_parser("kernels", help="Compare compiled kernels with pure-Python code.") \
+        .set_defaults(func=bench_kernels)
+    subparsers.add_parser("sprites", help="Compare separate unconverted images with a converted sprite atlas.") \
+        .set_defaults(func=bench_sprites)
+    memory = subparsers.add_parser("memory", help="Measure the memory held by each live game.")
+    memory.add_argument("--steps", type=int, default=20, help="The number of steps played by each game.")
+    memory.add_argument("--top", type=int, default=10, help="The number of largest allocation sites shown.")
+    memory.set_defaults(func=bench_memory)
+    subparsers.add_parser("calibrate", help="Calibrate planners for the automatic choice again.") \
+        .set_defaults(func=calibrate)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger(__name__)
+
+    try:
+        main()
+    except SystemExit:
+        raise
+    except BaseException as err:
+        logger.exception(err)
+        sys.exit(1)
@@ -1,70 +1,309 @@
+import copy
 import json
-from collections.abc import Callable
+import math
+from collections.abc import Callable, Mapping
 from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Optional
 
 Heuristic = Callable[[tuple[int, int], tuple[int, int]], float]
 
+# The default configuration file.
+DEFAULT_PATH: Path = Path(__file__).parent.joinpath("config.json")
+
+# The terrain names, ordered by their values in `game.map.Terrain`.
+TERRAINS: tuple[str, ...] = ("wall", "grass", "bush")
+
+
+def manhattan(src: tuple[int, int], dest: tuple[int, int]) -> float:
+    """
+    The Manhattan distance.
+    """
+    return abs(src[0] - dest[0]) + abs(src[1] - dest[1])
+
+
+_HEURISTICS: dict[str, Heuristic] = {
+    "manhattan": manhattan
+}
+
+
+class _Entries:
+    """
+    A schema of an object whose keys are arbitrary but values have the same schema.
+    """
+    def __init__(self, schema: Any) -> None:
+        self.schema: Any = schema
+
+
+_RANGE = {"min": int, "max": int}
+
+# The schema of the configuration file.
+# A type means a value of that type, a tuple means any of its schemas, and a dict means an object with these keys.
+_SCHEMA = {
+    "fps": int,
+    "maxSteps": int,
+    "mapPath": (str, None),
+    "chunkedMap": ({"size": int, "chunkSize": int, "seed": int, "maxMemory": int}, None),
+    "mapSize": {"height": _RANGE, "width": _RANGE},
+    "terrainProb": {"wall": float, "bush": float},
+    "visionRadius": {"agent": (int, None), "enemy": (int, None)},
+    "moveCost": _Entries(float),
+    "pathFinding": {
+        "heuristic": str, "bidirectional": bool, "clusterSize": int, "followPath": bool, "maxDrift": int
+    },
+    "strategyWeights": {"agent": _Entries(float), "enemy": _Entries(float)}
+}
+
+
+def _check(value: Any, schema: Any, path: str) -> None:
+    """
+    Check if a value matches a schema.
+    """
+    if isinstance(schema, tuple):
+        for s in schema:
+            try:
+                _check(value, s, path)
+                return
+            except ValueError:
+                continue
+        raise ValueError(f"Invalid configuration value at '{path}'.")
+    elif schema is None:
+        if value is not None:
+            raise ValueError(f"Configuration value at '{path}' should be null.")
+    elif isinstance(schema, dict):
+        if not isinstance(value, dict):
+            raise ValueError(f"Configuration value at '{path}' should be an object.")
+        for key, s in schema.items():
+            if key not in value:
+                raise ValueError(f"Missing configuration value at '{path}.{key}'.")
+            _check(value[key], s, f"{path}.{key}")
+    elif isinstance(schema, _Entries):
+        if not isinstance(value, dict):
+            raise ValueError(f"Configuration value at '{path}' should be an object.")
+        for key, v in value.items():
+            _check(v, schema.schema, f"{path}.{key}")
+    elif schema is float:
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"Configuration value at '{path}' should be a number.")
+    elif schema is int:
+        if isinstance(value, bool) or not isinstance(value, int):
+            raise ValueError(f"Configuration value at '{path}' should be an integer.")
+    elif not isinstance(value, schema):
+        raise ValueError(f"Configuration value at '{path}' should be a {schema.__name__}.")
+
 
 class Config:
     """
-    Configuration manager.
+    An immutable configuration snapshot.
+    It is validated once when created and passed explicitly, so each game can have its own configuration.
+    Attributes cannot be assigned after construction, and nested values are read-only views or copies.
     """
-    def __init__(self) -> None:
-        self._cfg: dict = {}
+    __slots__ = ("_raw", "_fps", "_max_steps", "_map_path", "_chunked_map", "_map_size", "_terrain_prob", "_vision_radius",
+                 "_move_cost", "_move_costs", "_heuristic", "_bidirectional", "_cluster_size", "_follow_path", "_max_drift",
+                 "_strategy_weights", "_strategies", "_frozen")
+
+    @staticmethod
+    def load(path: Path = DEFAULT_PATH) -> 'Config':
+        """
+        Load the configuration from a JSON file.
+        """
+        with path.open(encoding="utf-8") as file:
+            return Config(json.load(file))
+
+    def __init__(self, raw: dict) -> None:
+        """
+        The constructor.
+
+        -- PARAMETERS --
+        raw: The configuration object decoded from JSON. It will be validated.
+        """
+        _check(raw, _SCHEMA, "$")
+        raw = copy.deepcopy(raw)
+        self._raw: dict = raw
+        self._fps: int = raw["fps"]
+        self._max_steps: int = raw["maxSteps"]
+        if self._max_steps <= 0:
+            raise ValueError("Invalid maximum number of steps.")
+
+        self._map_path: Optional[Path] = Path(raw["mapPath"]) if raw["mapPath"] is not None else None
+        self._chunked_map: Optional[Mapping[str, int]] = None
+        if raw["chunkedMap"] is not None:
+            chunked = raw["chunkedMap"]
+            if chunked["size"] <= 1 or chunked["chunkSize"] <= 1 or chunked["maxMemory"] <= 0:
+                raise ValueError("Invalid chunked map.")
+            self._chunked_map = MappingProxyType(dict(chunked))
+
+        self._map_size: Mapping[str, Mapping[str, int]] = MappingProxyType(
+            {k: MappingProxyType(dict(v)) for k, v in raw["mapSize"].items()})
+        self._terrain_prob: Mapping[str, float] = MappingProxyType(dict(raw["terrainProb"]))
+
+        self._vision_radius: Mapping[str, Optional[int]] = MappingProxyType(dict(raw["visionRadius"]))
+        if any(r is not None and r < 0 for r in self._vision_radius.values()):
+            raise ValueError("Invalid vision radius.")
+
+        self._move_cost: Mapping[str, float] = MappingProxyType(dict(raw["moveCost"]))
+        if "grass" not in self._move_cost or any(c < 0 for c in self._move_cost.values()):
+            raise ValueError("Invalid move cost.")
+        self._move_costs: tuple[float, ...] = tuple(self._move_cost.get(t, math.inf) for t in TERRAINS)
+
+        path_finding = raw["pathFinding"]
+        if path_finding["heuristic"] not in _HEURISTICS:
+            raise ValueError("Invalid heuristic function.")
+        self._heuristic: Heuristic = _HEURISTICS[path_finding["heuristic"]]
+        self._bidirectional: bool = path_finding["bidirectional"]
+        self._cluster_size: int = path_finding["clusterSize"]
+        if self._cluster_size <= 1:
+            raise ValueError("Invalid cluster size.")
+        self._follow_path: bool = path_finding["followPath"]
+        self._max_drift: int = path_finding["maxDrift"]
+        if self._max_drift < 0:
+            raise ValueError("Invalid maximum drift.")
+
+        strategy_weights, strategies = {}, {}
+        for role, weights in raw["strategyWeights"].items():
+            if any(w < 0 for w in weights.values()):
+                raise ValueError("Invalid strategy weight.")
+            strategy_weights[role] = MappingProxyType(dict(weights))
+            strategies[role] = tuple((s, w) for s, w in weights.items() if w > 0)
+        self._strategy_weights: Mapping[str, Mapping[str, float]] = MappingProxyType(strategy_weights)
+        self._strategies: Mapping[str, tuple[tuple[str, float], ...]] = MappingProxyType(strategies)
+        self._frozen: bool = True
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if getattr(self, "_frozen", False):
+            raise AttributeError("A configuration is immutable.")
+        super().__setattr__(name, value)
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError("A configuration is immutable.")
+
+    def __reduce__(self) -> tuple:
+        # Slots would be restored by assignment, so a configuration is pickled as its raw object.
+        return Config, (self._raw,)
+
+    @property
+    def raw(self) -> dict:
+        """
+        A copy of the configuration object decoded from JSON. Changing it does not affect this snapshot.
+        """
+        return copy.deepcopy(self._raw)
 
     @property
     def fps(self) -> int:
         """
         The Frames Per Second.
         """
-        return self._cfg["fps"]
+        return self._fps
 
     @property
     def max_steps(self) -> int:
         """
         The maximum number of steps that the agent can move.
         """
-        return self._cfg["maxSteps"]
+        return self._max_steps
+
+    @property
+    def map_path(self) -> Optional[Path]:
+        """
+        A map file or a directory of them. `None` means maps are generated randomly.
+        """
+        return self._map_path
+
+    @property
+    def chunked_map(self) -> Optional[Mapping[str, int]]:
+        """
+        The square size, chunk size, seed and memory cap in MiB of a lazily generated chunked map.
+        `None` means maps have a random size from `map_size`.
+        """
+        return self._chunked_map
 
     @property
-    def map_size(self) -> dict[str, int]:
+    def map_size(self) -> Mapping[str, Mapping[str, int]]:
         """
         The size of game map.
         """
-        return self._cfg["mapSize"]
+        return self._map_size
 
     @property
-    def terrain_prob(self) -> dict[str, float]:
+    def terrain_prob(self) -> Mapping[str, float]:
         """
         The probability of generating each kind of terrain.
         """
-        return self._cfg["terrainProb"]
+        return self._terrain_prob
 
     @property
-    def move_cost(self) -> dict[str, float]:
+    def move_cost(self) -> Mapping[str, float]:
         """
         The move cost of each kind of terrain.
         """
-        return self._cfg["moveCost"]
+        return self._move_cost
 
     @property
-    def heuristic(self) -> 'Heuristic':
+    def move_costs(self) -> tuple[float, ...]:
+        """
+        The move cost of each kind of terrain, indexed by the terrain value.
+        A terrain without a move cost cannot be passed.
+        """
+        return self._move_costs
+
+    @property
+    def heuristic(self) -> Heuristic:
         """
         The heuristic function.
         """
-        def dist(src: tuple[int, int], dest: tuple[int, int]) -> float:
-            return abs(src[0] - dest[0]) + abs(src[1] - dest[1])
-        return dist
+        return self._heuristic
+
+    @property
+    def bidirectional(self) -> bool:
+        """
+        Whether A* path-finding searches from both the source and the destination.
+        """
+        return self._bidirectional
 
-    def strategy_weights(self, role: str) -> dict[str, float]:
+    @property
+    def cluster_size(self) -> int:
+        """
+        The side length of a cluster used by hierarchical path-finding.
+        """
+        return self._cluster_size
+
+    @property
+    def follow_path(self) -> bool:
+        """
+        Whether a path is followed until it becomes invalid instead of searching again on every move.
+        """
+        return self._follow_path
+
+    @property
+    def max_drift(self) -> int:
+        """
+        The maximum Manhattan distance the opponent can move from where it was when a followed path was found.
+        """
+        return self._max_drift
+
+    def vision_radius(self, role: str) -> Optional[int]:
+        """
+        The vision radius of a role. `None` means the role can see the whole map.
+        """
+        return self._vision_radius[role]
+
+    def strategy_weights(self, role: str) -> Mapping[str, float]:
         """
         The weight for each strategy.
         """
-        return self._cfg["strategyWeights"][role]
+        return self._strategy_weights[role]
 
-    def load(self, path: Path) -> None:
+    def with_strategy_weights(self, role: str, weights: Mapping[str, float]) -> 'Config':
         """
-        Load the configuration from a JSON file.
+        Create a configuration with different strategy weights of a role.
         """
-        with path.open(encoding="utf-8") as file:
-            self._cfg = json.load(file)
+        raw = copy.deepcopy(self._raw)
+        raw["strategyWeights"][role] = dict(weights)
+        return Config(raw)
+
+    def strategies(self, role: str) -> tuple[tuple[str, float], ...]:
+        """
+        The strategies of a role and their weights, excluding the ones with zero weight.
+        """
+        return self._strategies[role]
+
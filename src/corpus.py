@@ -0,0 +1,96 @@
+import struct
+from collections.abc import Sequence
+from multiprocessing.shared_memory import SharedMemory
+from typing import Optional
+
+from config import Config
+from game.map import Map
+from simulation import create_map
+
+
+class MapCorpus:
+    """
+    A set of maps packed into shared memory.
+    Worker processes attach to it and build read-only map views without copying terrains,
+    so memory use stays flat however many workers play on the same maps.
+
+    The layout is a header of the map count, then the width, height and offset of each map,
+    followed by the packed terrains of all maps.
+    """
+    _COUNT = struct.Struct("<I")
+    _ENTRY = struct.Struct("<IIQ")
+
+    @staticmethod
+    def create(cfg: Config, count: int, name: Optional[str] = None) -> 'MapCorpus':
+        """
+        Generate random maps with the configured size into a new corpus.
+        """
+        return MapCorpus.pack([create_map(cfg) for _ in range(count)], name)
+
+    @staticmethod
+    def pack(maps: Sequence[Map], name: Optional[str] = None) -> 'MapCorpus':
+        """
+        Pack maps into a new corpus. The caller owns it and should unlink it when finished.
+        """
+        if len(maps) == 0:
+            raise ValueError("A map corpus cannot be empty.")
+
+        header = MapCorpus._COUNT.size + MapCorpus._ENTRY.size * len(maps)
+        size = header + sum(map.width * map.height for map in maps)
+        shm = SharedMemory(name, create=True, size=size)
+        MapCorpus._COUNT.pack_into(shm.buf, 0, len(maps))
+        offset = header
+        for i, map in enumerate(maps):
+            MapCorpus._ENTRY.pack_into(shm.buf, MapCorpus._COUNT.size + MapCorpus._ENTRY.size * i,
+                                       map.width, map.height, offset)
+            shm.buf[offset:offset + map.width * map.height] = bytes(map.terrains)
+            offset += map.width * map.height
+        return MapCorpus(shm, owner=True)
+
+    @staticmethod
+    def attach(name: str) -> 'MapCorpus':
+        """
+        Attach to an existing corpus created by another process.
+        """
+        return MapCorpus(SharedMemory(name), owner=False)
+
+    def __init__(self, shm: SharedMemory, owner: bool) -> None:
+        self._shm: SharedMemory = shm
+        self._owner: bool = owner
+        count = self._COUNT.unpack_from(shm.buf, 0)[0]
+        self._entries: list[tuple[int, int, int]] = [
+            self._ENTRY.unpack_from(shm.buf, self._COUNT.size + self._ENTRY.size * i) for i in range(count)
+        ]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def name(self) -> str:
+        """
+        The name used by other processes to attach to the corpus.
+        """
+        return self._shm.name
+
+    def map(self, index: int, cfg: Config) -> Map:
+        """
+        Build a read-only view of a map. Its terrains are not copied.
+        """
+        width, height, offset = self._entries[index]
+        terrains = self._shm.buf[offset:offset + width * height].toreadonly()
+        return Map(width, height, cfg, terrains)
+
+    def maps(self, cfg: Config) -> list[Map]:
+        """
+        Build read-only views of all maps.
+        """
+        return [self.map(i, cfg) for i in range(len(self))]
+
+    def close(self) -> None:
+        """
+        Detach from the corpus. All map views should have been released.
+        The creator also unlinks the shared memory.
+        """
+        if self._owner:
+            self._shm.unlink()
+        self._shm.close()
@@ -1,11 +1,22 @@
-from pathlib import Path
 from random import randint
-from collections.abc import Sequence
+from collections.abc import Callable, Sequence
+from typing import Optional
 
 import pygame as pg
 
+from assets import Atlas
+from config import Config
+from game.events import Event, EventType
 from game.map import Map, Status, Terrain
-from game import cfg
+from game.role import Enemy
+
+
+def random_image(images: Sequence[pg.Surface]) -> pg.Surface:
+    """
+    Get a random image.
+    """
+    assert len(images) > 0
+    return images[randint(0, len(images) - 1)]
 
 
 class Displayer:
@@ -18,7 +29,22 @@ class Displayer:
 
     _BG_COLOR: tuple[int, int, int] = (0, 170, 255)
 
-    def __init__(self) -> None:
+    def __init__(self, cfg: Config, zoom: float = 1, atlas: Optional[Atlas] = None) -> None:
+        """
+        The constructor.
+
+        -- PARAMETERS --
+        cfg: The configuration.
+        zoom: The zoom level of tiles.
+        atlas: The sprite atlas, which can be shared by displayers. A new one is created if it is `None`.
+        """
+        if zoom <= 0:
+            raise ValueError("Invalid zoom level.")
+        self._zoom: float = zoom
+        self._tile_width: int = round(self._TILE_WIDTH * zoom)
+        self._tile_height: int = round(self._TILE_HEIGHT * zoom)
+        self._tile_floor_height: int = round(self._TILE_FLOOR_HEIGHT * zoom)
+
         self._map: Map = None
         self._status: Status = None
 
@@ -32,96 +58,103 @@ class Displayer:
         if self._fps <= 0:
             raise ValueError("Invalid FPS.")
 
-        self._images: dict[str, pg.image] = self._load_images(Path(__file__).parent.joinpath("res"))
-        self._enemy_image: pg.image = None
-        self._ground_images: list[list[pg.image]] = None
+        # Sprites are loaded when a map is set up, after a display mode has been set.
+        self._atlas: Atlas = atlas if atlas is not None else Atlas()
+        self._images: dict[str, pg.Surface] = None
+        self._enemy_image: pg.Surface = None
+        self._ground_images: list[list[pg.Surface]] = None
+
+        # The position of each tile on the map surface.
+        self._tiles: list[list[tuple[int, int]]] = None
+
+        # Whether a position has been discovered by the enemy, updated with its reveal events.
+        self._revealed: list[list[bool]] = None
 
     def init(self, map: Map, status: Status) -> 'Displayer':
-        self._map = map
         self._status = status
-        self._width = map.width * self._TILE_WIDTH
-        self._height = (map.height - 1) * self._TILE_FLOOR_HEIGHT + self._TILE_HEIGHT
-        self._window = pg.display.set_mode((self._width, self._height))
+        self._window = pg.display.set_mode(self.size(map))
+        self._setup(map, random_image)
+        for x in range(map.width):
+            for y in range(map.height):
+                self._revealed[x][y] = status.enemy.revealed((x, y))
+        status.events.subscribe(self._on_events, (EventType.REVEALED,))
+        return self
+
+    def update(self) -> None:
+        self._window.fill(self._BG_COLOR)
+        self._draw_map(self._window, self._status.enemy.on_path, self._status.agent.pos, self._status.enemy.pos, self._status.game_end)
+        pg.display.update()
+        self._fps_clock.tick(self._fps)
+
+    def _on_events(self, step: int, events: Sequence[Event]) -> None:
+        for event in events:
+            if event.role == Enemy.name():
+                for x, y in event.cells:
+                    self._revealed[x][y] = True
+
+    def size(self, map: Map) -> tuple[int, int]:
+        """
+        Get the size of the image of a map.
+        """
+        return map.width * self._tile_width, (map.height - 1) * self._tile_floor_height + self._tile_height
+
+    def _setup(self, map: Map, choose: Callable[[Sequence[pg.Surface]], pg.Surface]) -> None:
+        """
+        Choose images for a map and clear its discovered positions.
+
+        -- PARAMETERS --
+        map: The map.
+        choose: The function choosing an image from candidates.
+        """
+        self._map = map
+        self._width, self._height = self.size(map)
+        self._images = self._atlas.sprites(self._zoom)
+        self._tiles = [[(x * self._tile_width, y * self._tile_floor_height) for y in range(map.height)]
+                       for x in range(map.width)]
 
         walls = (self._images["wooden wall"], self._images["stone wall"])
         enemies = (self._images["boy"], self._images["cat girl"], self._images["horn girl"],
                    self._images["pink girl"], self._images["princess"])
 
-        def random_image(images: Sequence[pg.image]) -> pg.image:
-            """
-            Get a random image.
-            """
-            assert len(images) > 0
-            return images[randint(0, len(images) - 1)]
-
-        self._enemy_image = random_image(enemies)
+        self._enemy_image = choose(enemies)
         self._ground_images = [[None] * map.height for _ in range(map.width)]
+        self._revealed = [[False] * map.height for _ in range(map.width)]
         for x in range(map.width):
             for y in range(map.height):
                 if map.terrain(x, y) == Terrain.WALL:
-                    self._ground_images[x][y] = random_image(walls)
+                    self._ground_images[x][y] = choose(walls)
                 else:
                     self._ground_images[x][y] = self._images["grass"]
-        return self
-
-    def update(self) -> None:
-        self._window.fill(self._BG_COLOR)
-        self._draw_map()
-        pg.display.update()
-        self._fps_clock.tick(self._fps)
 
-    def _draw_map(self) -> None:
-        path = set(self._status.enemy.path) if len(self._status.enemy.path) > 0 else set()
-        map_surf = pg.Surface((self._width, self._height))
-        map_surf.fill(self._BG_COLOR)
+    def _draw_map(self, surf: pg.Surface, on_path: Callable[[tuple[int, int]], bool], agent: tuple[int, int],
+                  enemy: tuple[int, int], game_end: bool) -> None:
+        """
+        Draw the map and roles onto a surface filled with the background color.
+        `on_path` checks if a position is on the enemy's path.
+        """
         for x in range(self._map.width):
             for y in range(self._map.height):
-                rect = pg.Rect((x * self._TILE_WIDTH, y * self._TILE_FLOOR_HEIGHT,
-                                self._TILE_WIDTH, self._TILE_HEIGHT))
-                if self._status.game_end or self._status.enemy.revealed((x, y)):
+                rect = self._tiles[x][y]
+                if game_end or self._revealed[x][y]:
                     # The position has been discovered.
-                    if (x, y) in path and self._map.terrain(x, y) != Terrain.WALL:
+                    if on_path((x, y)) and self._map.terrain(x, y) != Terrain.WALL:
                         # Show the path from the enemy to the agent.
-                        map_surf.blit(self._images["grass path"], rect)
+                        surf.blit(self._images["grass path"], rect)
                     else:
-                        map_surf.blit(self._ground_images[x][y], rect)
+                        surf.blit(self._ground_images[x][y], rect)
 
                     if self._map.terrain(x, y) == Terrain.BUSH:
                         # Show bushes.
-                        map_surf.blit(self._images["bush"], rect)
+                        surf.blit(self._images["bush"], rect)
                 else:
                     # Show black fog.
-                    if (x, y) in path:
-                        map_surf.blit(self._images["plain path"], rect)
+                    if on_path((x, y)):
+                        surf.blit(self._images["plain path"], rect)
                     else:
-                        map_surf.blit(self._images["plain"], rect)
+                        surf.blit(self._images["plain"], rect)
 
                 # Show roles.
-                if self._status.agent.pos == (x, y):
-                    map_surf.blit(self._images["agent"], rect)
-                elif self._status.enemy.pos == (x, y):
-                    map_surf.blit(self._enemy_image, rect)
-        self._window.blit(map_surf, map_surf.get_rect())
-
-    @staticmethod
-    def _load_images(path: Path) -> dict[str, pg.image]:
-        return {
-            # Agent.
-            "agent": pg.image.load(str(path.joinpath("star.png"))),
-
-            # Enemies.
-            "boy": pg.image.load(str(path.joinpath("boy.png"))),
-            "cat girl": pg.image.load(str(path.joinpath("cat-girl.png"))),
-            "horn girl": pg.image.load(str(path.joinpath("horn-girl.png"))),
-            "pink girl": pg.image.load(str(path.joinpath("pink-girl.png"))),
-            "princess": pg.image.load(str(path.joinpath("princess.png"))),
-
-            # Terrains.
-            "plain": pg.image.load(str(path.joinpath("plain.png"))),
-            "grass": pg.image.load(str(path.joinpath("grass.png"))),
-            "plain path": pg.image.load(str(path.joinpath("plain-path.png"))),
-            "grass path": pg.image.load(str(path.joinpath("grass-path.png"))),
-            "bush": pg.image.load(str(path.joinpath("bush.png"))),
-            "stone wall": pg.image.load(str(path.joinpath("stone-wall.png"))),
-            "wooden wall": pg.image.load(str(path.joinpath("wooden-wall.png")))
-        }
+                if agent == (x, y):
+                    surf.blit(self._images["agent"], rect)
+                elif enemy == (x, y):
+                    surf.blit(self._enemy_image, rect)
@@ -12,22 +12,19 @@ class Action(IntEnum):
     LEFT = 3
     RIGHT = 4
 
+    @property
+    def offset(self) -> tuple[int, int]:
+        """
+        Get the change of position after an action.
+        """
+        return _OFFSETS[self]
+
     def dest(self, src: tuple[int, int]) -> tuple[int, int]:
         """
         Get the destination after an action.
         """
-        if self.value == Action.STAY:
-            return src
-        elif self.value == Action.UP:
-            return src[0], src[1] + 1
-        elif self.value == Action.DOWN:
-            return src[0], src[1] - 1
-        elif self.value == Action.LEFT:
-            return src[0] - 1, src[1]
-        elif self.value == Action.RIGHT:
-            return src[0] + 1, src[1]
-        else:
-            assert False
+        dx, dy = _OFFSETS[self]
+        return src[0] + dx, src[1] + dy
 
     @staticmethod
     def next(src: tuple[int, int], dest: tuple[int, int]) -> 'Action':
@@ -57,3 +54,7 @@ class Action(IntEnum):
             return actions[0]
         else:
             return actions[randint(0, 1)]
+
+
+# The change of position after each action, indexed by actions.
+_OFFSETS: tuple[tuple[int, int], ...] = ((0, 0), (0, 1), (0, -1), (-1, 0), (1, 0))
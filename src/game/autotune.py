@@ -0,0 +1,286 @@
+import contextlib
+import json
+import logging
+import math
+import os
+import platform
+import random
+import tempfile
+import time
+from collections.abc import Iterator
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+import game.map as gm
+import game.role as gr
+import game.strategy as sg
+from config import Config
+from game import kernels
+
+# The automatic choice of a path-finding planner.
+# The fastest planner depends on the host, the size and terrains of a map and how much of it the enemy can see,
+# so each planner is timed on a few calibration maps once per host, and a map uses the fastest planner
+# of the most similar calibration map. Calibration results are cached on disk.
+# Processes starting workers should call `prepare` first, so workers do not calibrate at the same time under load.
+
+logger = logging.getLogger(__name__)
+
+# The strategy name of the automatic planner.
+NAME: str = "auto"
+
+# The planners that can be chosen.
+PLANNERS: tuple[str, ...] = ("aStar", "bidirectional", "hpaStar", "jps")
+
+# The planners that are only fast on dense maps, so they are not chosen for chunked maps.
+_DENSE: frozenset[str] = frozenset(("aStar", "jps"))
+
+# The default file caching calibration results.
+CACHE_PATH: Path = Path.home().joinpath(".cache", "chase-ai", "planners.json")
+
+# The version of calibration. Results of other versions are measured again.
+_VERSION: int = 1
+
+# The side lengths, wall and bush probabilities of calibration maps.
+_SIZES: tuple[int, ...] = (16, 32, 64)
+_WALLS: tuple[float, ...] = (0.1, 0.3)
+_BUSHES: tuple[float, ...] = (0.05, 0.3)
+
+# The number of steps played on each calibration map. The enemy searches every two steps.
+_STEPS: int = 60
+
+_SEED: int = 0
+
+# The maximum number of positions of a map sampled to measure its walls and bushes.
+_SAMPLES: int = 2 ** 16
+
+
+class Point(NamedTuple):
+    """
+    A calibration map and the mean number of milliseconds of a search by each planner on it.
+    """
+    size: int
+
+    # The proportions of walls and bushes.
+    wall: float
+    bush: float
+
+    times: dict[str, float]
+
+    def distance(self, size: float, wall: float, bush: float) -> float:
+        """
+        The difference from a map, where doubling the side length counts the same as 20% more walls or bushes.
+        """
+        return abs(math.log2(size / self.size)) + (abs(wall - self.wall) + abs(bush - self.bush)) / 0.2
+
+
+# The calibration points of each host and vision radius, loaded on first use.
+_points: dict[str, list[Point]] = {}
+
+# The planner chosen for a calibration key, the index of the nearest calibration point and whether a map is dense.
+_choices: dict[tuple[str, int, bool], str] = {}
+
+
+def new_planner(name: str, role: 'gr.Role') -> 'sg.PathFinder':
+    """
+    Create a planner by its name in `PLANNERS`.
+    """
+    if name == "aStar" or name == "bidirectional":
+        planner = sg.AStar(role)
+        planner.bidirectional = name == "bidirectional"
+        return planner
+    elif name == "hpaStar":
+        return sg.HpaStar(role)
+    elif name == "jps":
+        return sg.JumpPointSearch(role)
+    else:
+        raise ValueError("Invalid planner.")
+
+
+def uses(cfg: Config) -> bool:
+    """
+    Check if the enemy uses the automatic planner.
+    """
+    return any(name == NAME for name, _ in cfg.strategies(gr.Enemy.name()))
+
+
+def prepare(cfg: Config) -> None:
+    """
+    Calibrate planners if the enemy uses the automatic planner and this host has not calibrated them.
+    """
+    if uses(cfg):
+        calibration(cfg, cfg.vision_radius(gr.Enemy.name()))
+
+
+def create_planner(role: 'gr.Role') -> 'sg.PathFinder':
+    """
+    Create the fastest planner for a role's map.
+    """
+    return new_planner(choose(role.cfg, role.map), role)
+
+
+def choose(cfg: Config, map: 'gm.Map') -> str:
+    """
+    Choose the fastest planner for a map. Each choice is logged when first made.
+    """
+    radius = cfg.vision_radius(gr.Enemy.name())
+    wall, bush = _proportions(cfg, map)
+    size = math.sqrt(map.width * map.height)
+    points = calibration(cfg, radius)
+    index = min(range(len(points)), key=lambda i: points[i].distance(size, wall, bush))
+    key = (_key(cfg, radius), index, map.dense)
+    choice = _choices.get(key)
+    if choice is None:
+        point = points[index]
+        times = {name: t for name, t in point.times.items() if map.dense or name not in _DENSE}
+        choice = min(times, key=times.get)
+        _choices[key] = choice
+        logger.info(f"Chose {choice} for {map.width}x{map.height} maps with {wall:.0%} walls and {bush:.0%} bushes "
+                    f"like the {point.size}x{point.size} calibration map with {point.wall:.0%} walls "
+                    f"and {point.bush:.0%} bushes, where a search takes "
+                    + ", ".join(f"{name} {t:.3f} ms" for name, t in times.items()) + ".")
+    return choice
+
+
+def calibration(cfg: Config, radius: Optional[int], path: Path = CACHE_PATH,
+                force: bool = False) -> list[Point]:
+    """
+    Get the calibration points of this host, the path-finding configuration and a vision radius of the enemy.
+    They are loaded from the cache file, or measured and saved if they are missing or `force` is set.
+    The cache file is locked meanwhile, so concurrent processes calibrate once and share the results.
+    """
+    key = _key(cfg, radius)
+    if not force and key in _points:
+        return _points[key]
+
+    with _lock(path):
+        cache = {}
+        try:
+            cache = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            pass
+
+        if not force and key in cache:
+            points = [Point(p["size"], p["wall"], p["bush"], p["times"]) for p in cache[key]]
+        else:
+            begin = time.perf_counter()
+            points = _calibrate(cfg, radius)
+            logger.info(f"Calibrated planners in {time.perf_counter() - begin:.1f} s.")
+            cache[key] = [p._asdict() for p in points]
+            try:
+                # Each process writes its own temporary file, which replaces the cache file at once.
+                with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=path.parent, prefix=path.name + ".",
+                                                 suffix=".tmp", delete=False) as file:
+                    json.dump(cache, file, indent=4)
+                os.replace(file.name, path)
+            except OSError as err:
+                logger.warning(f"Failed to cache calibration results in '{path}': {err}")
+    _points[key] = points
+    return points
+
+
+def _key(cfg: Config, radius: Optional[int]) -> str:
+    """
+    Get the key of calibration results, which covers everything timing planners depends on.
+    """
+    costs = ",".join(str(cost) for cost in cfg.move_costs)
+    return f"{platform.node()}/{platform.machine()}/Python {platform.python_version()}" \
+           f"/Numba {kernels.AVAILABLE}/radius {radius}/costs {costs}/cluster {cfg.cluster_size}/v{_VERSION}"
+
+
+@contextlib.contextmanager
+def _lock(path: Path) -> Iterator[None]:
+    """
+    Hold an exclusive lock of a cache file. Nothing is locked if the directory cannot be written
+    or file locks are not supported.
+    """
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        file = path.with_name(path.name + ".lock").open("a")
+    except OSError:
+        yield
+        return
+    with file:
+        if fcntl is not None:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+        yield
+
+
+def _proportions(cfg: Config, map: 'gm.Map') -> tuple[float, float]:
+    """
+    Get the proportions of walls and bushes of a map.
+    Chunked maps are not scanned, so the configured probabilities are used.
+    Large maps are sampled at regular intervals, so a memory-mapped map is neither copied nor read whole.
+    """
+    if not map.dense:
+        wall = cfg.terrain_prob["wall"]
+        return wall, (1 - wall) * cfg.terrain_prob["bush"]
+    step = max(1, len(map.terrains) // _SAMPLES)
+    terrains = bytes(map.terrains[::step])
+    return terrains.count(gm.Terrain.WALL.value) / len(terrains), terrains.count(gm.Terrain.BUSH.value) / len(terrains)
+
+
+def _calibrate(cfg: Config, radius: Optional[int]) -> list[Point]:
+    """
+    Time each planner on the same game states of calibration maps.
+    The global random state is restored afterwards, so seeded games are not affected.
+    """
+    state = random.getstate()
+    try:
+        random.seed(_SEED)
+        return [_measure(cfg, radius, size, wall, bush) for size in _SIZES for wall in _WALLS for bush in _BUSHES]
+    finally:
+        random.setstate(state)
+
+
+def _measure(cfg: Config, radius: Optional[int], size: int, wall: float, bush: float) -> Point:
+    raw = cfg.raw
+    raw["mapPath"] = raw["chunkedMap"] = None
+    raw["terrainProb"] = {"wall": wall, "bush": bush}
+    raw["visionRadius"][gr.Enemy.name()] = radius
+    # The enemy chases the agent without planning, so the states do not depend on any planner.
+    raw["strategyWeights"] = {gr.Agent.name(): {"random": 1}, gr.Enemy.name(): {"moveClose": 1}}
+    cfg = Config(raw)
+
+    while True:
+        map = gm.Map(size, size, cfg)
+        blanks = map.blanks()
+        if len(blanks) >= 2:
+            break
+    random.shuffle(blanks)
+    status = gm.Status(cfg)
+    status.agent = gr.Agent(status, map, blanks[0])
+    status.enemy = gr.Enemy(status, map, blanks[1])
+
+    planners = {name: new_planner(name, status.enemy) for name in PLANNERS}
+    for planner in planners.values():
+        # Compile kernels and build caches before timing.
+        planner._path(status)
+
+    elapsed = dict.fromkeys(PLANNERS, 0.0)
+    searches = 0
+    for step in range(_STEPS):
+        move_enemy = step % 2 == 1
+        if move_enemy:
+            for name, planner in planners.items():
+                begin = time.perf_counter()
+                planner._path(status)
+                elapsed[name] += time.perf_counter() - begin
+            searches += 1
+        status.agent.move()
+        if move_enemy:
+            status.enemy.move()
+            for planner in planners.values():
+                planner.on_reveal(status.enemy.new_reveals)
+        status.new_step()
+        if status.agent.stuck():
+            break
+
+    terrains = bytes(map.terrains)
+    return Point(size, terrains.count(gm.Terrain.WALL.value) / len(terrains),
+                 terrains.count(gm.Terrain.BUSH.value) / len(terrains),
+                 {name: t / max(searches, 1) * 1000 for name, t in elapsed.items()})
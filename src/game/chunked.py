@@ -0,0 +1,150 @@
+from collections import OrderedDict
+from collections.abc import Sequence
+from random import Random
+from typing import Optional
+
+from config import Config
+from game.map import Map, Terrain, _TERRAINS, terrain_generator
+
+
+class ChunkedLayer:
+    """
+    A mutable byte for each position of a chunked map.
+    A chunk is only allocated when one of its positions is set, so memory tracks the area actually used.
+    """
+    __slots__ = ("_size", "_width", "_chunks")
+
+    def __init__(self, chunk_size: int, width: int) -> None:
+        self._size: int = chunk_size
+        self._width: int = width
+        self._chunks: dict[tuple[int, int], bytearray] = {}
+
+    @property
+    def chunk_count(self) -> int:
+        return len(self._chunks)
+
+    def get(self, x: int, y: int) -> int:
+        chunk = self._chunks.get((x // self._size, y // self._size))
+        return chunk[(y % self._size) * self._size + x % self._size] if chunk is not None else 0
+
+    def set(self, x: int, y: int, value: int = 1) -> None:
+        key = (x // self._size, y // self._size)
+        chunk = self._chunks.get(key)
+        if chunk is None:
+            chunk = bytearray(self._size * self._size)
+            self._chunks[key] = chunk
+        chunk[(y % self._size) * self._size + x % self._size] = value
+
+    def get_cell(self, cell: int) -> int:
+        y, x = divmod(cell, self._width)
+        return self.get(x, y)
+
+
+class ChunkedMap(Map):
+    """
+    An effectively unbounded map made of fixed-size chunks.
+    A chunk is generated deterministically from the seed and its coordinate on first access,
+    and kept in an LRU cache with a memory cap. Evicted chunks will be generated again when needed.
+    """
+    __slots__ = ("_size", "_seed", "_max_chunks", "_chunks", "_last_key", "_last_chunk")
+
+    def __init__(self, width: int, height: int, cfg: Config, chunk_size: int, seed: int, max_memory: int) -> None:
+        """
+        The constructor.
+
+        -- PARAMETERS --
+        width: The width of map.
+        height: The height of map.
+        cfg: The configuration.
+        chunk_size: The side length of a chunk.
+        seed: The seed of terrain generation.
+        max_memory: The maximum number of bytes used by cached chunks.
+        """
+        assert width > 1 and height > 1
+        if chunk_size <= 1:
+            raise ValueError("Invalid chunk size.")
+        elif max_memory < chunk_size * chunk_size:
+            raise ValueError("The memory cap should hold at least one chunk.")
+
+        self._cfg: Config = cfg
+        self._costs: tuple[float, ...] = cfg.move_costs
+        self._width: int = width
+        self._height: int = height
+        self._moves: Optional[tuple[Sequence[int], ...]] = None
+
+        self._size: int = chunk_size
+        self._seed: int = seed
+        self._max_chunks: int = max_memory // (chunk_size * chunk_size)
+        self._chunks: OrderedDict[tuple[int, int], bytearray] = OrderedDict()
+
+        # The chunk accessed last, which skips the LRU update for consecutive accesses.
+        self._last_key: tuple[int, int] = None
+        self._last_chunk: bytearray = None
+
+        # Validate the probability of terrains up front.
+        terrain_generator(cfg, Random(seed).random)
+
+    @property
+    def dense(self) -> bool:
+        return False
+
+    @property
+    def terrains(self) -> Sequence[int]:
+        raise ValueError("A chunked map cannot be packed.")
+
+    @property
+    def chunk_count(self) -> int:
+        """
+        The number of cached chunks.
+        """
+        return len(self._chunks)
+
+    def terrain(self, x: int, y: int) -> Terrain:
+        if not self.valid(x, y):
+            return Terrain.WALL
+        key = (x // self._size, y // self._size)
+        chunk = self._last_chunk if key == self._last_key else self._chunk(key)
+        return _TERRAINS[chunk[(y % self._size) * self._size + x % self._size]]
+
+    def wall_cell(self, cell: int) -> bool:
+        return self.wall(*self.pos(cell))
+
+    def new_layer(self) -> ChunkedLayer:
+        return ChunkedLayer(self._size, self._width)
+
+    def spawn_area(self) -> tuple[tuple[int, int], tuple[int, int]]:
+        """
+        Roles are created in the chunk at the center of the map.
+        """
+        cx, cy = self._width // 2 // self._size, self._height // 2 // self._size
+        begin = (cx * self._size, cy * self._size)
+        return begin, (min(begin[0] + self._size, self._width), min(begin[1] + self._size, self._height))
+
+    def blank_count(self) -> int:
+        """
+        Get the number of blank positions in the spawn area.
+        """
+        return len(self.blanks())
+
+    def blanks(self) -> list[tuple[int, int]]:
+        """
+        Get all blank positions in the spawn area.
+        """
+        begin, end = self.spawn_area()
+        return [(x, y) for x in range(begin[0], end[0]) for y in range(begin[1], end[1]) if not self.wall(x, y)]
+
+    def _chunk(self, key: tuple[int, int]) -> bytearray:
+        """
+        Get a chunk, generating it if it is not cached.
+        """
+        chunk = self._chunks.get(key)
+        if chunk is None:
+            random_terrain = terrain_generator(self._cfg, Random(f"{self._seed}:{key[0]}:{key[1]}").random)
+            chunk = bytearray(random_terrain().value for _ in range(self._size * self._size))
+            self._chunks[key] = chunk
+            if len(self._chunks) > self._max_chunks:
+                self._chunks.popitem(last=False)
+        else:
+            self._chunks.move_to_end(key)
+        self._last_key, self._last_chunk = key, chunk
+        return chunk
@@ -0,0 +1,91 @@
+from collections.abc import Callable, Iterable, Sequence
+from enum import IntEnum
+from typing import NamedTuple, Optional
+
+
+class EventType(IntEnum):
+    """
+    The kind of change in a game.
+    """
+    # A role moved onto a new position.
+    MOVED = 0
+
+    # A role discovered new positions.
+    REVEALED = 1
+
+    # A role discovered walls. They are also included in the `REVEALED` event of the same move.
+    WALL_DISCOVERED = 2
+
+    # A role moved into a bush and will lose its next turn.
+    BUSH_TRAPPED = 3
+
+    # The game ended.
+    GAME_ENDED = 4
+
+
+class Event(NamedTuple):
+    type: EventType
+
+    # The name of the role, or `None` for game events.
+    role: Optional[str]
+
+    # The positions involved, such as the destination of a move or the discovered positions.
+    cells: tuple[tuple[int, int], ...]
+
+
+# A subscriber receives the step and the events happening in it.
+Subscriber = Callable[[int, Sequence[Event]], None]
+
+
+class EventBus:
+    """
+    Changes of a game, delivered to subscribers in a batch per step.
+    Emitters should check `active` before creating events, so nothing is allocated when there is no subscriber.
+    """
+    __slots__ = ("_subscribers", "_pending")
+
+    def __init__(self) -> None:
+        # Each subscriber with the event types it receives. `None` means all types.
+        self._subscribers: list[tuple[Subscriber, Optional[frozenset[EventType]]]] = []
+
+        # The events of the current step.
+        self._pending: list[Event] = []
+
+    @property
+    def active(self) -> bool:
+        """
+        Whether there is any subscriber.
+        """
+        return len(self._subscribers) > 0
+
+    def subscribe(self, subscriber: Subscriber, types: Optional[Iterable[EventType]] = None) -> None:
+        """
+        Receive the events of each step.
+
+        -- PARAMETERS --
+        subscriber: The function receiving events.
+        types: The event types received. `None` means all types.
+        """
+        self._subscribers.append((subscriber, frozenset(types) if types is not None else None))
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self._subscribers = [(s, types) for s, types in self._subscribers if s != subscriber]
+
+    def emit(self, event: Event) -> None:
+        """
+        Add an event of the current step.
+        """
+        if self.active:
+            self._pending.append(event)
+
+    def flush(self, step: int) -> None:
+        """
+        Deliver the events of a step to subscribers.
+        """
+        if len(self._pending) == 0:
+            return
+        events, self._pending = self._pending, []
+        for subscriber, types in self._subscribers:
+            batch = events if types is None else [e for e in events if e.type in types]
+            if len(batch) > 0:
+                subscriber(step, batch)
@@ -0,0 +1,277 @@
+import heapq
+import math
+from collections.abc import Callable
+
+Pos = tuple[int, int]
+
+# The adjacency of a node: (neighbor, cost).
+Links = list[tuple[Pos, float]]
+
+
+class _Cluster:
+    """
+    A rectangular part of the map with its entrances.
+    """
+    def __init__(self, begin: Pos, end: Pos) -> None:
+        # The bounds are `[begin, end)`.
+        self.begin: Pos = begin
+        self.end: Pos = end
+
+        # The abstract edges of each entrance, including intra-cluster and inter-cluster ones.
+        self.links: dict[Pos, Links] = {}
+
+    def contains(self, x: int, y: int) -> bool:
+        return self.begin[0] <= x < self.end[0] and self.begin[1] <= y < self.end[1]
+
+
+class ClusterGraph:
+    """
+    The abstract graph of hierarchical path-finding (HPA*).
+    The map is split into clusters. Entrances are placed on the borders between clusters,
+    and the costs between entrances of the same cluster are precomputed.
+    Clusters are built lazily when the search reaches them, so the planning cost grows
+    with the number of clusters crossed instead of the number of positions.
+    """
+    # An entrance longer than this gets a node at both ends instead of one in the middle.
+    _LONG_ENTRANCE: int = 6
+
+    def __init__(self, width: int, height: int, size: int, cost: Callable[[int, int], float],
+                 min_cost: float) -> None:
+        """
+        The constructor.
+
+        -- PARAMETERS --
+        width: The width of map.
+        height: The height of map.
+        size: The side length of a cluster.
+        cost: Get the cost of moving onto a position. `math.inf` means it cannot be passed.
+        min_cost: The minimum cost of moving one step, used to estimate the remaining cost.
+        """
+        assert size > 1
+        self._width: int = width
+        self._height: int = height
+        self._size: int = size
+        self._cost: Callable[[int, int], float] = cost
+        self._min_cost: float = min_cost
+
+        self._clusters: dict[Pos, _Cluster] = {}
+
+        # The entrance pairs of each border, keyed by `(cluster x, cluster y, vertical)`.
+        self._borders: dict[tuple[int, int, bool], list[tuple[Pos, Pos]]] = {}
+
+        # The number of nodes expanded by the latest search.
+        self.expanded: int = 0
+
+    def invalidate(self, x: int, y: int) -> None:
+        """
+        Invalidate the clusters affected by a position whose cost has changed.
+        """
+        cx, cy = self._cluster_of(x, y)
+        for key in ((cx, cy, False), (cx, cy, True), (cx - 1, cy, False), (cx, cy - 1, True)):
+            self._borders.pop(key, None)
+        # The entrances of neighbor clusters depend on the shared borders.
+        for c in ((cx, cy), (cx + 1, cy), (cx - 1, cy), (cx, cy + 1), (cx, cy - 1)):
+            self._clusters.pop(c, None)
+
+    def path(self, src: Pos, dest: Pos) -> list[Pos]:
+        """
+        Find a path from the source to the destination.
+        Only the first leg of the abstract path is refined, which is from the source to the first node.
+        """
+        self.expanded = 0
+        src_cluster = self._cluster(*self._cluster_of(*src))
+        dest_cluster = self._cluster(*self._cluster_of(*dest))
+        src_dists, src_prevs = self._dijkstra(src_cluster, src, reverse=False)
+        dest_dists, _ = self._dijkstra(dest_cluster, dest, reverse=True)
+
+        def links(node: Pos) -> Links:
+            """
+            Get the abstract edges of a node, including the temporary ones of the source and destination.
+            """
+            cluster = self._cluster(*self._cluster_of(*node))
+            ret = list(cluster.links.get(node, []))
+            if node == src:
+                ret.extend((e, src_dists[e]) for e in cluster.links if e in src_dists)
+                if dest in src_dists:
+                    ret.append((dest, src_dists[dest]))
+            if cluster is dest_cluster and node in dest_dists:
+                ret.append((dest, dest_dists[node]))
+            return ret
+
+        def estimate(node: Pos) -> float:
+            return (abs(node[0] - dest[0]) + abs(node[1] - dest[1])) * self._min_cost
+
+        # A reverse search from the destination runs alongside, so an unreachable destination in a small
+        # enclosed area fails once that area is exhausted instead of after the whole map is built.
+        # Passability is symmetric, so the abstract edges of a node also lead back to it.
+        # It stops as soon as it reaches a node the source can reach.
+        reverse_heap = [] if dest in src_dists else [(0, 0, dest)]
+        reached = {dest}
+
+        # A* on the abstract graph.
+        g = {src: 0.0}
+        prevs: dict[Pos, Pos] = {}
+        closed = set()
+        counter = 0
+        open_heap = [(estimate(src), counter, src)]
+        while len(open_heap) > 0:
+            if len(reverse_heap) > 0 and not self._reverse_step(reverse_heap, reached, src, src_dists, dest,
+                                                                dest_cluster, dest_dists):
+                return []
+            _, _, node = heapq.heappop(open_heap)
+            if node in closed:
+                continue
+            if node == dest:
+                return self._refine(src, self._retrace(prevs, dest), src_prevs)
+            closed.add(node)
+            self.expanded += 1
+            for neighbor, cost in links(node):
+                new_g = g[node] + cost
+                if neighbor not in closed and new_g < g.get(neighbor, math.inf):
+                    g[neighbor] = new_g
+                    prevs[neighbor] = node
+                    counter += 1
+                    heapq.heappush(open_heap, (new_g + estimate(neighbor), counter, neighbor))
+        return []
+
+    def _reverse_step(self, heap: list[tuple[int, int, Pos]], reached: set[Pos], src: Pos,
+                      src_dists: dict[Pos, float], dest: Pos, dest_cluster: _Cluster,
+                      dest_dists: dict[Pos, float]) -> bool:
+        """
+        Expand a node of the reverse search, which moves towards the source first.
+        The heap is cleared once the search reaches a node the source can reach.
+
+        -- RETURN --
+        Whether the destination may still be reachable, which is `False` once the reverse search is exhausted.
+        """
+        _, _, node = heapq.heappop(heap)
+        self.expanded += 1
+        if node == dest:
+            neighbors = [e for e in dest_cluster.links if e in dest_dists]
+        else:
+            neighbors = [e for e, _ in self._cluster(*self._cluster_of(*node)).links.get(node, [])]
+        for neighbor in neighbors:
+            if neighbor in src_dists:
+                heap.clear()
+                return True
+            if neighbor not in reached:
+                reached.add(neighbor)
+                heapq.heappush(heap, (abs(neighbor[0] - src[0]) + abs(neighbor[1] - src[1]), len(reached), neighbor))
+        return len(heap) > 0
+
+    def _refine(self, src: Pos, abstract: list[Pos], src_prevs: dict[Pos, Pos]) -> list[Pos]:
+        """
+        Refine the first leg of an abstract path into positions.
+        """
+        assert len(abstract) > 1 and abstract[0] == src
+        first = abstract[1]
+        if first not in src_prevs:
+            # An inter-cluster edge between two adjacent entrances.
+            return [src, first]
+        return self._retrace(src_prevs, first)
+
+    def _cluster_of(self, x: int, y: int) -> Pos:
+        return x // self._size, y // self._size
+
+    def _cluster(self, cx: int, cy: int) -> _Cluster:
+        """
+        Get a cluster, building its entrances and edges if necessary.
+        """
+        if (cx, cy) in self._clusters:
+            return self._clusters[(cx, cy)]
+
+        begin = (cx * self._size, cy * self._size)
+        end = (min(begin[0] + self._size, self._width), min(begin[1] + self._size, self._height))
+        cluster = _Cluster(begin, end)
+        inters: dict[Pos, Links] = {}
+        for key, first in (((cx, cy, False), True), ((cx, cy, True), True),
+                           ((cx - 1, cy, False), False), ((cx, cy - 1, True), False)):
+            for a, b in self._border(key):
+                inside, outside = (a, b) if first else (b, a)
+                inters.setdefault(inside, []).append((outside, self._cost(*outside)))
+
+        for entrance, links in inters.items():
+            dists, _ = self._dijkstra(cluster, entrance, reverse=False)
+            cluster.links[entrance] = links + [(e, dists[e]) for e in inters if e != entrance and e in dists]
+        self._clusters[(cx, cy)] = cluster
+        return cluster
+
+    def _border(self, key: tuple[int, int, bool]) -> list[tuple[Pos, Pos]]:
+        """
+        Get the entrance pairs on the border between a cluster and its right or upper neighbor.
+        """
+        if key in self._borders:
+            return self._borders[key]
+
+        cx, cy, vertical = key
+        pairs = []
+        if 0 <= cx and 0 <= cy:
+            if vertical:
+                y = (cy + 1) * self._size - 1
+                if y + 1 < self._height:
+                    line = range(cx * self._size, min((cx + 1) * self._size, self._width))
+                    pairs = [((x, y), (x, y + 1)) for x in line]
+            else:
+                x = (cx + 1) * self._size - 1
+                if x + 1 < self._width:
+                    line = range(cy * self._size, min((cy + 1) * self._size, self._height))
+                    pairs = [((x, y), (x + 1, y)) for y in line]
+
+        entrances = []
+        run: list[tuple[Pos, Pos]] = []
+        for pair in pairs + [None]:
+            if pair is not None and self._cost(*pair[0]) < math.inf and self._cost(*pair[1]) < math.inf:
+                run.append(pair)
+                continue
+            # A run of passable pairs ends.
+            if len(run) >= self._LONG_ENTRANCE:
+                entrances.extend((run[0], run[-1]))
+            elif len(run) > 0:
+                entrances.append(run[len(run) // 2])
+            run = []
+        self._borders[key] = entrances
+        return entrances
+
+    def _dijkstra(self, cluster: _Cluster, origin: Pos, reverse: bool) -> tuple[dict[Pos, float], dict[Pos, Pos]]:
+        """
+        Calculate the costs between a position and others in the same cluster.
+
+        -- PARAMETERS --
+        cluster: The cluster where the search is restricted.
+        origin: The position where the search starts.
+        reverse: Whether to calculate the costs from other positions to the origin.
+        """
+        dists = {origin: 0.0}
+        prevs: dict[Pos, Pos] = {}
+        counter = 0
+        open_heap = [(0.0, counter, origin)]
+        while len(open_heap) > 0:
+            dist, _, (x, y) = heapq.heappop(open_heap)
+            if dist > dists[(x, y)]:
+                continue
+            # The cost of a reverse edge is the cost of moving onto the current position.
+            back_cost = self._cost(x, y) if reverse else 0
+            for neighbor in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+                if not cluster.contains(*neighbor):
+                    continue
+                cost = self._cost(*neighbor)
+                if cost == math.inf:
+                    continue
+                new_dist = dist + (back_cost if reverse else cost)
+                if new_dist < dists.get(neighbor, math.inf):
+                    dists[neighbor] = new_dist
+                    prevs[neighbor] = (x, y)
+                    counter += 1
+                    heapq.heappush(open_heap, (new_dist, counter, neighbor))
+        return dists, prevs
+
+    @staticmethod
+    def _retrace(prevs: dict[Pos, Pos], node: Pos) -> list[Pos]:
+        """
+        Retrace the path to a node.
+        """
+        path = [node]
+        while path[-1] in prevs:
+            path.append(prevs[path[-1]])
+        path.reverse()
+        return path
@@ -0,0 +1,187 @@
+import threading
+from collections.abc import Sequence
+from typing import Optional
+
+import game.map as gm
+
+# Compiled kernels of the innermost loops, used when Numba is installed.
+# Maps and reveal layers are passed as arrays sharing memory with their packed bytes, so they are never copied.
+# Each kernel makes exactly the same decisions as the pure-Python code it replaces, including how ties are broken.
+# Importing Numba takes much longer than importing the game, so it is imported and the kernels are compiled
+# when `AVAILABLE`, `a_star` or `wall_count` is first accessed. `warm_up` does it in advance.
+
+# The lazily loaded attributes.
+_LAZY: frozenset[str] = frozenset(("AVAILABLE", "a_star", "wall_count"))
+
+_load_lock: threading.Lock = threading.Lock()
+
+# The terrain value of walls in `game.map.Terrain`.
+_WALL: int = 0
+
+
+def __getattr__(name: str) -> object:
+    if name in _LAZY:
+        _load()
+        if name in globals():
+            return globals()[name]
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+
+
+def _load() -> None:
+    """
+    Import Numba and compile the kernels, or set `AVAILABLE` to `False` if Numba is not installed.
+    """
+    global AVAILABLE, numba, np, _known_cost, a_star, wall_count
+    with _load_lock:
+        if "AVAILABLE" in globals():
+            return
+        try:
+            import numba
+            import numpy as np
+        except ImportError:
+            AVAILABLE = False
+            return
+        _known_cost = numba.njit(cache=True)(_known_cost)
+        a_star = numba.njit(cache=True)(_a_star)
+        wall_count = numba.njit(cache=True)(_wall_count)
+        # Whether the kernels can be used.
+        AVAILABLE = True
+
+
+def warm_up() -> None:
+    """
+    Compile the kernels for the argument types passed by strategies, or load them from Numba's cache,
+    so processes forked afterwards do not compile them again.
+    """
+    _load()
+    if not AVAILABLE:
+        return
+    terrains, revealed = np.ones(4, dtype=np.uint8), np.zeros(4, dtype=np.uint8)
+    for layer, omniscient in ((revealed, False), (np.zeros(1, dtype=np.uint8), True)):
+        a_star(terrains, layer, omniscient, 2, 2, floats((0, 1, 1)), 1.0, 1.0, 0, 3)
+        wall_count(terrains, layer, omniscient, 2, 2, -1, -1, 1, 1)
+
+
+def knowledge(map: 'gm.Map', layer: Optional['gm.Layer']) -> tuple['np.ndarray', 'np.ndarray', bool]:
+    """
+    Create arrays sharing memory with the terrains of a dense map and the positions discovered by a role.
+
+    -- RETURN --
+    The terrains, whether each position has been discovered and whether the role can see the whole map.
+    """
+    terrains = np.frombuffer(map.terrains, dtype=np.uint8)
+    if layer is None:
+        return terrains, np.zeros(1, dtype=np.uint8), True
+    return terrains, np.frombuffer(layer.cells, dtype=np.uint8), False
+
+
+def floats(values: Sequence[float]) -> 'np.ndarray':
+    """
+    Create an array of floats.
+    """
+    return np.array(values, dtype=np.float64)
+
+
+def _known_cost(terrains, revealed, omniscient, costs, grass, i):
+    if omniscient or revealed[i] != 0:
+        return costs[terrains[i]]
+    return grass
+
+
+def _a_star(terrains, revealed, omniscient, width, height, costs, grass, step, src, dest):
+    """
+    Unidirectional A* path-finding with a zero heuristic, the same as `AStar._path`.
+    The open list keeps insertion order and the first position with the lowest cost is expanded.
+
+    -- RETURN --
+    The indices of positions on the path in row-major order, empty if there is none,
+    and the number of expanded positions.
+    """
+    size = width * height
+    g = np.zeros(size, dtype=np.float64)
+    prev = np.full(size, -1, dtype=np.int64)
+    # 0 means unvisited, 1 means in the open list and 2 means expanded.
+    state = np.zeros(size, dtype=np.uint8)
+    open_list = np.empty(size, dtype=np.int64)
+    count = 0
+    expanded = 0
+
+    open_list[0] = src
+    count = 1
+    state[src] = 1
+    while count > 0:
+        best = 0
+        for k in range(1, count):
+            if g[open_list[k]] < g[open_list[best]]:
+                best = k
+        i = open_list[best]
+        for k in range(best, count - 1):
+            open_list[k] = open_list[k + 1]
+        count -= 1
+
+        if i == dest:
+            length = 1
+            j = i
+            while prev[j] != -1:
+                j = prev[j]
+                length += 1
+            path = np.empty(length, dtype=np.int64)
+            j = i
+            for k in range(length - 1, -1, -1):
+                path[k] = j
+                j = prev[j]
+            return path, expanded
+
+        state[i] = 2
+        expanded += 1
+        x = i % width
+        y = i // width
+        for d in range(4):
+            nx, ny = x, y
+            if d == 0:
+                nx = x + 1
+            elif d == 1:
+                nx = x - 1
+            elif d == 2:
+                ny = y + 1
+            else:
+                ny = y - 1
+            if nx < 0 or nx >= width or ny < 0 or ny >= height:
+                continue
+            n = ny * width + nx
+            if state[n] == 2:
+                continue
+            if (omniscient or revealed[n] != 0) and terrains[n] == _WALL:
+                continue
+
+            new_g = g[i] + step
+            new_g += _known_cost(terrains, revealed, omniscient, costs, grass, n)
+            if state[n] == 1:
+                if new_g < g[n]:
+                    g[n] = new_g
+                    prev[n] = i
+            else:
+                g[n] = new_g
+                prev[n] = i
+                state[n] = 1
+                open_list[count] = n
+                count += 1
+    return np.empty(0, dtype=np.int64), expanded
+
+
+def _wall_count(terrains, revealed, omniscient, width, height, begin_x, begin_y, end_x, end_y):
+    """
+    Count the positions in `[begin, end)` and the known walls among them, the same as `WallDensity._density`.
+    Positions outside the map count as walls. Both counts start from one.
+    """
+    total, wall = 1, 1
+    for x in range(begin_x, end_x):
+        for y in range(begin_y, end_y):
+            total += 1
+            if x < 0 or x >= width or y < 0 or y >= height:
+                wall += 1
+            else:
+                i = y * width + x
+                if (omniscient or revealed[i] != 0) and terrains[i] == _WALL:
+                    wall += 1
+    return total, wall
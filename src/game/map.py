@@ -1,9 +1,14 @@
+import threading
+from array import array
+from collections import OrderedDict
+from collections.abc import Callable, Sequence
 from enum import Enum, auto
 from random import random
-import math
+from typing import Optional
 
-from grid import Grid
-from game import cfg
+from config import Config
+from game.action import Action
+from game.events import Event, EventBus, EventType
 from game.role import Enemy, Agent
 
 
@@ -27,51 +32,257 @@ class Occupy(Enum):
 class Terrain(Enum):
     """
     The kind of terrain in a map.
+    The values are the indices of `Config.move_costs`.
     """
-    WALL = auto()
-    GRASS = auto()
-    BUSH = auto()
+    WALL = 0
+    GRASS = 1
+    BUSH = 2
 
-    def move_cost(self) -> float:
+    def move_cost(self, cfg: Config) -> float:
         """
         Get the move cost.
         """
-        name = self.name.lower()
-        return cfg.move_cost[name] if name in cfg.move_cost else math.inf
+        return cfg.move_costs[self.value]
+
+
+# The terrains indexed by their values.
+_TERRAINS: tuple[Terrain, ...] = tuple(Terrain)
+
+_WALL: int = Terrain.WALL.value
 
 
-class Map(Grid):
+def terrain_generator(cfg: Config, rand: Callable[[], float]) -> Callable[[], Terrain]:
     """
-    The game map.
+    Create a function generating random terrains with the configured probability.
+
+    -- PARAMETERS --
+    cfg: The configuration.
+    rand: The random number generator returning a number in `[0, 1)`.
+    """
+    wall = cfg.terrain_prob[Terrain.WALL.name.lower()]
+    bush = cfg.terrain_prob[Terrain.BUSH.name.lower()]
+    if not 0 <= wall < 1 or not 0 <= bush <= 1:
+        raise ValueError("Invalid probability of terrain.")
+
+    def random_terrain() -> Terrain:
+        if rand() < wall:
+            return Terrain.WALL
+        elif rand() < bush:
+            return Terrain.BUSH
+        else:
+            return Terrain.GRASS
+    return random_terrain
+
+
+class MoveView:
     """
+    The destination of an action from each cell like a table of `move_table`, computed on access instead of being stored.
+    It is used by maps too large for tables.
+    """
+    __slots__ = ("_width", "_height", "_dx", "_dy")
+
+    def __init__(self, width: int, height: int, action: Action) -> None:
+        self._width: int = width
+        self._height: int = height
+        self._dx, self._dy = action.offset
+
+    def __getitem__(self, cell: int) -> int:
+        y, x = divmod(cell, self._width)
+        x, y = x + self._dx, y + self._dy
+        return y * self._width + x if 0 <= x < self._width and 0 <= y < self._height else -1
+
+
+# The maximum number of cells of a map whose moves are stored in tables. Larger maps compute them on access.
+MAX_TABLE_CELLS: int = 2 ** 18
+
+# The maximum number of bytes of cached move tables, shared by maps of the same size.
+_MAX_TABLE_BYTES: int = 2 ** 25
+
+# The cached move tables of each map size, in the order they were used, and their number of bytes.
+_tables: OrderedDict[tuple[int, int], tuple[array, ...]] = OrderedDict()
+_table_bytes: int = 0
+_tables_lock: threading.Lock = threading.Lock()
+
+
+def _bytes(tables: tuple[array, ...]) -> int:
+    return sum(table.itemsize * len(table) for table in tables)
+
+
+def move_table(width: int, height: int) -> tuple[Sequence[int], ...]:
+    """
+    Get the destination of each action from each position of a map, shared by maps of the same size.
+    Positions are cell IDs `y * width + x`, and moves out of the map lead to -1.
+    The tables are indexed by actions and then cell IDs.
+    Maps with more than `MAX_TABLE_CELLS` cells get views computing destinations on access.
+    """
+    size = width * height
+    if size > MAX_TABLE_CELLS:
+        return tuple(MoveView(width, height, action) for action in Action)
+
+    with _tables_lock:
+        tables = _tables.get((width, height))
+        if tables is not None:
+            _tables.move_to_end((width, height))
+            return tables
+
+    tables = []
+    for action in Action:
+        dx, dy = action.offset
+        shift = dy * width + dx
+        table = array("i", range(shift, size + shift))
+        # Mask the column or the row whose moves leave the map.
+        if dx != 0:
+            table[width - 1 if dx > 0 else 0::width] = array("i", [-1]) * height
+        if dy != 0:
+            table[slice(size - width, None) if dy > 0 else slice(0, width)] = array("i", [-1]) * width
+        tables.append(table)
+    tables = tuple(tables)
+
+    global _table_bytes
+    with _tables_lock:
+        if (width, height) not in _tables:
+            _tables[(width, height)] = tables
+            _table_bytes += _bytes(tables)
+        # Evict the least recently used tables until the cache fits its budget.
+        while len(_tables) > 1 and _table_bytes > _MAX_TABLE_BYTES:
+            _table_bytes -= _bytes(_tables.popitem(last=False)[1])
+    return tables
+
+
+class Layer:
+    """
+    A mutable byte for each position of a map in row-major order, such as whether a role has discovered it.
+    """
+    __slots__ = ("_width", "_cells")
+
     def __init__(self, width: int, height: int) -> None:
+        self._width: int = width
+        self._cells: bytearray = bytearray(width * height)
+
+    @property
+    def cells(self) -> bytearray:
+        """
+        The bytes of all positions in row-major order.
+        """
+        return self._cells
+
+    def get(self, x: int, y: int) -> int:
+        return self._cells[y * self._width + x]
+
+    def set(self, x: int, y: int, value: int = 1) -> None:
+        self._cells[y * self._width + x] = value
+
+    def get_cell(self, cell: int) -> int:
+        return self._cells[cell]
+
+
+class Map:
+    """
+    The game map.
+    Terrains are packed into a byte array in row-major order, whose elements are terrain values.
+    Game rules refer to positions by their cell IDs `y * width + x` internally, and convert them to tuples at the edge.
+    """
+    __slots__ = ("_cfg", "_costs", "_width", "_height", "_terrains", "_blank_count", "_moves")
+
+    # The number of bytes copied at a time when counting terrains of a read-only view.
+    _COUNT_WINDOW: int = 2 ** 20
+
+    def __init__(self, width: int, height: int, cfg: Config, terrains: Optional[Sequence[int]] = None,
+                 blank_count: Optional[int] = None) -> None:
+        """
+        The constructor.
+
+        -- PARAMETERS --
+        width: The width of map.
+        height: The height of map.
+        cfg: The configuration.
+        terrains: The packed terrains. It will be used without copying, so a read-only view can be shared.
+                  A random map will be generated if it is `None`.
+        blank_count: The number of blank positions of `terrains` if it is known, such as one saved in a map file.
+                     Otherwise it is counted on first use.
+        """
         assert width > 1 and height > 1
+        self._cfg: Config = cfg
+        self._costs: tuple[float, ...] = cfg.move_costs
+        self._width: int = width
+        self._height: int = height
+        self._blank_count: Optional[int] = blank_count
 
-        wall = Terrain.WALL.name.lower()
-        bush = Terrain.BUSH.name.lower()
-        prob = cfg.terrain_prob
-        if not 0 <= prob[wall] < 1 or not 0 <= prob[bush] <= 1:
-            raise ValueError("Invalid probability of terrain.")
-
-        def random_terrain():
-            if random() < prob[wall]:
-                return Terrain.WALL
-            elif random() < prob[bush]:
-                return Terrain.BUSH
-            else:
-                return Terrain.GRASS
+        # The destination of each action from each cell, created on first use.
+        self._moves: Optional[tuple[Sequence[int], ...]] = None
 
-        spots = [[None] * height for _ in range(width)]
+        if terrains is not None:
+            if len(terrains) != width * height:
+                raise ValueError("Invalid size of terrains.")
+            self._terrains: Sequence[int] = terrains
+            return
+
+        random_terrain = terrain_generator(cfg, random)
+        self._terrains = bytearray(width * height)
         for x in range(width):
             for y in range(height):
-                spots[x][y] = random_terrain()
-        super().__init__(spots)
+                self._terrains[y * width + x] = random_terrain().value
+
+    @property
+    def cfg(self) -> Config:
+        return self._cfg
+
+    @property
+    def width(self) -> int:
+        return self._width
+
+    @property
+    def height(self) -> int:
+        return self._height
+
+    @property
+    def dense(self) -> bool:
+        """
+        Whether all terrains are allocated up front.
+        """
+        return True
+
+    @property
+    def terrains(self) -> Sequence[int]:
+        """
+        The packed terrains in row-major order.
+        """
+        return self._terrains
+
+    @property
+    def moves(self) -> tuple[Sequence[int], ...]:
+        """
+        The cell ID of the destination of each action from each cell, or -1 if it is out of the map.
+        It is indexed by actions and then cell IDs, such as `moves[Action.UP][cell]`.
+        """
+        if self._moves is None:
+            self._moves = move_table(self._width, self._height)
+        return self._moves
+
+    def cell(self, x: int, y: int) -> int:
+        """
+        Get the cell ID of a position.
+        """
+        return y * self._width + x
+
+    def pos(self, cell: int) -> tuple[int, int]:
+        """
+        Get the position of a cell ID.
+        """
+        y, x = divmod(cell, self._width)
+        return x, y
+
+    def valid(self, x: int, y: int) -> bool:
+        """
+        Check if a position is in the map.
+        """
+        return 0 <= x < self._width and 0 <= y < self._height
 
     def terrain(self, x: int, y: int) -> Terrain:
         """
         Get the kind of terrain at a position.
         """
-        return self.spot(x, y) if self.valid(x, y) else Terrain.WALL
+        return _TERRAINS[self._terrains[y * self._width + x]] if self.valid(x, y) else Terrain.WALL
 
     def wall(self, x: int, y: int) -> bool:
         """
@@ -79,6 +290,32 @@ class Map(Grid):
         """
         return self.terrain(x, y) == Terrain.WALL
 
+    def new_layer(self) -> Layer:
+        """
+        Create a layer with a zero byte for each position.
+        """
+        return Layer(self._width, self._height)
+
+    def spawn_area(self) -> tuple[tuple[int, int], tuple[int, int]]:
+        """
+        Get the area `[begin, end)` where roles are created.
+        """
+        return (0, 0), (self._width, self._height)
+
+    def blank_count(self) -> int:
+        """
+        Get the number of blank positions.
+        """
+        if self._blank_count is None:
+            if isinstance(self._terrains, (bytes, bytearray)):
+                walls = self._terrains.count(_WALL)
+            else:
+                # Count a read-only view in windows instead of copying it whole.
+                walls = sum(bytes(self._terrains[i:i + self._COUNT_WINDOW]).count(_WALL)
+                            for i in range(0, len(self._terrains), self._COUNT_WINDOW))
+            self._blank_count = self._width * self._height - walls
+        return self._blank_count
+
     def blanks(self) -> list[tuple[int, int]]:
         """
         Get all blank positions.
@@ -103,11 +340,30 @@ class Map(Grid):
         else:
             return Occupy.NONE
 
+    def occupied_cell(self, cell: int, status: 'Status') -> Occupy:
+        """
+        Check if a cell has been occupied like `occupied`. -1 means a position out of the map.
+        """
+        if cell < 0:
+            return Occupy.INVALID
+        elif self.wall_cell(cell):
+            return Occupy.WALL
+        elif (status.agent and cell == status.agent.cell) or (status.enemy and cell == status.enemy.cell):
+            return Occupy.ROLE
+        else:
+            return Occupy.NONE
+
+    def wall_cell(self, cell: int) -> bool:
+        """
+        Check if there is a wall in a cell in the map.
+        """
+        return self._terrains[cell] == _WALL
+
     def move_cost(self, x: int, y: int) -> float:
         """
         Get the move cost of a position.
         """
-        return self.terrain(x, y).move_cost()
+        return self._costs[self.terrain(x, y).value]
 
 
 class Status:
@@ -119,13 +375,27 @@ class Status:
     The status of a level.
     """
 
-    def __init__(self) -> None:
+    __slots__ = ("_cfg", "agent", "enemy", "_steps", "_good_steps", "_game_end", "_events")
+
+    def __init__(self, cfg: Config) -> None:
+        self._cfg: Config = cfg
         self.agent: Agent = None
         self.enemy: Enemy = None
         self._steps: int = 1
         self._good_steps: int = 0
         self._game_end: bool = False
 
+        # The changes of the game, delivered after each step.
+        self._events: EventBus = EventBus()
+
+    @property
+    def cfg(self) -> Config:
+        return self._cfg
+
+    @property
+    def events(self) -> EventBus:
+        return self._events
+
     @property
     def game_end(self) -> bool:
         """
@@ -170,11 +440,18 @@ class Status:
         if good_step():
             self._good_steps += 1
 
+        # Deliver the changes of the finished step.
+        self._events.flush(self._steps - 1)
+
     def end_game(self) -> None:
         """
-        End the game.
+        End the game after the last step.
         """
         self._game_end = True
+        if self._events.active:
+            # The game ends in the last finished step, whose other events have been delivered by `new_step`.
+            self._events.emit(Event(EventType.GAME_ENDED, None, ()))
+            self._events.flush(self._steps - 1)
 
     def opponent(self, role: Agent | Enemy) -> Agent | Enemy:
         """
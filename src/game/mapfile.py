@@ -0,0 +1,240 @@
+import argparse
+import mmap
+import re
+import struct
+import sys
+from array import array
+from collections import deque
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Optional
+
+from config import Config, DEFAULT_PATH
+from game.action import Action
+from game.map import Map, Terrain
+
+# The file extension of map files.
+SUFFIX: str = ".map"
+
+_MAGIC: bytes = b"CHMP"
+_VERSION: int = 2
+
+# The header: magic, version, flags, width, height and the number of blank positions.
+_HEADER = struct.Struct("<4sHHIIQ")
+
+# A byte that is not a terrain value.
+_INVALID_TERRAIN = re.compile(b"[^" + re.escape(bytes(t.value for t in Terrain)) + b"]")
+
+# The flags of optional planes.
+_LABELS: int = 0x1
+_ADJACENCY: int = 0x2
+
+
+def _align(offset: int) -> int:
+    """
+    Align an offset to 4 bytes.
+    """
+    return (offset + 3) & ~3
+
+
+def components(map: Map) -> array:
+    """
+    Label connected blank positions in row-major order.
+    Walls are labeled as zero and each connected area gets a label from one.
+    """
+    labels = array("I", bytes(4 * map.width * map.height))
+    label = 0
+    for start in range(map.width * map.height):
+        x, y = start % map.width, start // map.width
+        if labels[start] != 0 or map.wall(x, y):
+            continue
+        label += 1
+        labels[start] = label
+        queue = deque([(x, y)])
+        while len(queue) > 0:
+            x, y = queue.popleft()
+            for action in Action:
+                nx, ny = action.dest((x, y))
+                if not map.wall(nx, ny) and labels[ny * map.width + nx] == 0:
+                    labels[ny * map.width + nx] = label
+                    queue.append((nx, ny))
+    return labels
+
+
+def adjacency(map: Map) -> bytearray:
+    """
+    Get a bitmask of the passable neighbors of each position in row-major order.
+    The bit `n - 1` is set if the destination of the action whose value is `n` is not a wall.
+    """
+    masks = bytearray(map.width * map.height)
+    for y in range(map.height):
+        for x in range(map.width):
+            mask = 0
+            for action in Action:
+                if action != Action.STAY and not map.wall(*action.dest((x, y))):
+                    mask |= 1 << (action.value - 1)
+            masks[y * map.width + x] = mask
+    return masks
+
+
+def save(map: Map, path: Path, labels: bool = False, adjacency_masks: bool = False) -> None:
+    """
+    Save a map into a binary file.
+
+    -- PARAMETERS --
+    map: The map.
+    path: The file path.
+    labels: Whether to save precomputed connectivity labels.
+    adjacency_masks: Whether to save precomputed adjacency masks.
+    """
+    flags = (_LABELS if labels else 0) | (_ADJACENCY if adjacency_masks else 0)
+    size = map.width * map.height
+    terrains = bytes(map.terrains)
+    if _INVALID_TERRAIN.search(terrains) is not None:
+        raise ValueError("Invalid terrain value.")
+    with path.open("wb") as file:
+        file.write(_HEADER.pack(_MAGIC, _VERSION, flags, map.width, map.height, map.blank_count()))
+        file.write(terrains)
+        if labels:
+            file.write(bytes(_align(file.tell()) - file.tell()))
+            plane = components(map)
+            if sys.byteorder != "little":
+                plane.byteswap()
+            file.write(plane.tobytes())
+        if adjacency_masks:
+            file.write(adjacency(map))
+        assert file.tell() == _size(flags, size)
+
+
+def _size(flags: int, size: int) -> int:
+    """
+    Get the file size of a map.
+    """
+    offset = _HEADER.size + size
+    if flags & _LABELS:
+        offset = _align(offset) + 4 * size
+    if flags & _ADJACENCY:
+        offset += size
+    return offset
+
+
+class MapFile:
+    """
+    A map file loaded through memory mapping.
+    Only the pages that are touched will be read, so huge maps can be opened instantly.
+    The terrain plane is trusted unless it is verified, because checking it would read the whole file.
+    `save` only writes valid terrains.
+    """
+    def __init__(self, path: Path, cfg: Config, verify: bool = False) -> None:
+        """
+        The constructor.
+
+        -- PARAMETERS --
+        path: The file path.
+        cfg: The configuration of the map.
+        verify: Whether to reject terrain bytes that are not terrain values and a wrong number of blanks.
+        """
+        with path.open("rb") as file:
+            self._mmap: mmap.mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        buf = memoryview(self._mmap)
+        if len(buf) < _HEADER.size:
+            raise ValueError(f"Invalid map file '{path}'.")
+        magic, version, flags, width, height, blanks = _HEADER.unpack_from(buf, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"Invalid map file '{path}'.")
+        elif version != _VERSION:
+            raise ValueError(f"Unsupported map file version {version}.")
+        elif len(buf) != _size(flags, width * height):
+            raise ValueError(f"Invalid size of map file '{path}'.")
+
+        size = width * height
+        offset = _HEADER.size
+        terrains = buf[offset:offset + size]
+        if verify:
+            if _INVALID_TERRAIN.search(terrains) is not None:
+                raise ValueError(f"Invalid terrain in map file '{path}'.")
+            elif Map(width, height, cfg, terrains).blank_count() != blanks:
+                raise ValueError(f"Invalid number of blanks in map file '{path}'.")
+        self._map: Map = Map(width, height, cfg, terrains, blanks)
+        offset += size
+
+        self._labels: Optional[Sequence[int]] = None
+        if flags & _LABELS:
+            offset = _align(offset)
+            plane = buf[offset:offset + 4 * size]
+            self._labels = plane.cast("I") if sys.byteorder == "little" else _swapped(plane)
+            offset += 4 * size
+
+        self._adjacency: Optional[Sequence[int]] = None
+        if flags & _ADJACENCY:
+            self._adjacency = buf[offset:offset + size]
+
+    @property
+    def map(self) -> Map:
+        return self._map
+
+    @property
+    def labels(self) -> Optional[Sequence[int]]:
+        """
+        The precomputed connectivity labels in row-major order, if they have been saved.
+        """
+        return self._labels
+
+    @property
+    def adjacency(self) -> Optional[Sequence[int]]:
+        """
+        The precomputed adjacency masks in row-major order, if they have been saved.
+        """
+        return self._adjacency
+
+
+def _swapped(plane: memoryview) -> array:
+    """
+    Convert a little-endian label plane on a big-endian machine. It has to be copied.
+    """
+    labels = array("I", plane.tobytes())
+    labels.byteswap()
+    return labels
+
+
+def load(path: Path, cfg: Config, verify: bool = False) -> Map:
+    """
+    Load a map from a binary file. See `MapFile` for `verify`.
+    """
+    return MapFile(path, cfg, verify).map
+
+
+def files(path: Path) -> list[Path]:
+    """
+    Get the map files of a path, which is either a map file or a directory of them.
+    """
+    if path.is_dir():
+        ret = sorted(p for p in path.iterdir() if p.suffix == SUFFIX)
+        if len(ret) == 0:
+            raise ValueError(f"No map file in '{path}'.")
+        return ret
+    else:
+        return [path]
+
+
+def main() -> None:
+    from simulation import create_map
+
+    parser = argparse.ArgumentParser(description="Generate random map files.")
+    parser.add_argument("dir", type=Path, help="The output directory.")
+    parser.add_argument("--config", type=Path, default=DEFAULT_PATH, help="The configuration file.")
+    parser.add_argument("--count", type=int, default=1, help="The number of maps.")
+    parser.add_argument("--labels", action="store_true", help="Save precomputed connectivity labels.")
+    parser.add_argument("--adjacency", action="store_true", help="Save precomputed adjacency masks.")
+    args = parser.parse_args()
+
+    cfg = Config.load(args.config)
+    args.dir.mkdir(parents=True, exist_ok=True)
+    for i in range(args.count):
+        map = create_map(cfg)
+        save(map, args.dir.joinpath(f"{i:04d}{SUFFIX}"), args.labels, args.adjacency)
+
+
+if __name__ == "__main__":
+    main()
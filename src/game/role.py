@@ -1,15 +1,27 @@
-from collections.abc import Sequence
+from collections.abc import Callable, Hashable, Sequence
+from typing import Optional
 
+import game.autotune as at
 import game.map as gm
 import game.strategy as sg
-from game import cfg
+from config import Config
 from game.action import Action
+from game.events import Event, EventType
+from game.vision import Vision
 
 
 class Role:
     """
     The game role.
     """
+    __slots__ = ("_status", "_map", "_cfg", "_pos", "_cell", "_vision", "_revealed", "_new_reveals", "_reveal_epoch",
+                 "_prev_try_cell", "_wall_blocked", "_bush_trapped", "_selector", "_strategies", "_lvl_cache",
+                 "decision_hook")
+
+    # The flags of each position in the layer of discovered positions.
+    _REVEALED: int = 1
+    _VIEWED: int = 2
+
     def __init__(self, status: 'gm.Status', map: 'gm.Map', pos: tuple[int, int]) -> None:
         """
         The constructor.
@@ -21,15 +33,27 @@ class Role:
         """
         self._status: 'gm.Status' = status
         self._map: gm.Map = map
+        self._cfg: Config = status.cfg
 
-        # The current position.
+        # The current position and its cell ID.
         self._pos: tuple[int, int] = None
+        self._cell: int = -1
+
+        # The field of view. `None` means the role can see the whole map.
+        radius = self._cfg.vision_radius(self.name())
+        self._vision: Optional[Vision] = Vision(radius, map.wall) if radius is not None else None
+
+        # Whether a position has been discovered, and whether its field of view has been scanned.
+        self._revealed: Optional[gm.Layer] = map.new_layer() if self._vision is not None else None
 
-        # Whether a position has been discovered.
-        self._revealed: list[list[bool]] = [[False] * map.height for _ in range(map.width)]
+        # The positions discovered by the latest move.
+        self._new_reveals: list[tuple[int, int]] = []
 
-        # The previous destination the role tried to move to.
-        self._prev_try_pos: tuple[int, int] = None
+        # The number of moves that have discovered new positions.
+        self._reveal_epoch: int = 0
+
+        # The cell ID of the previous destination the role tried to move to. -1 means it is out of the map.
+        self._prev_try_cell: int = -1
 
         # Whether the previous action failed because of a wall.
         self._wall_blocked: bool = False
@@ -41,18 +65,47 @@ class Role:
         self._selector: sg.ActionSelector = None
         self._strategies: list[sg.Strategy] = []
 
+        # The latest dependency key and result of each strategy, indexed by the strategy chain.
+        self._lvl_cache: dict[int, tuple[Hashable, sg.ActionLevels]] = {}
+
+        # Called with the role, the action levels of each strategy and the chosen action after each decision.
+        self.decision_hook: Optional[Callable[['Role', Sequence[sg.ActionLevels], Action], None]] = None
+
         assert map.occupied(*pos, status) == gm.Occupy.NONE
-        self._try_move(pos)
+        self._try_move(map.cell(*pos))
         self._reveal()
 
+    @staticmethod
+    def name() -> str:
+        """
+        The role name used in the configuration.
+        Subclasses should implement their logic.
+        """
+        assert False
+
     @property
     def pos(self) -> tuple[int, int]:
         return self._pos
 
+    @property
+    def cell(self) -> int:
+        """
+        The cell ID of the current position.
+        """
+        return self._cell
+
     @property
     def map(self) -> 'gm.Map':
         return self._map
 
+    @property
+    def cfg(self) -> Config:
+        return self._cfg
+
+    @property
+    def strategies(self) -> Sequence['sg.Strategy']:
+        return self._strategies
+
     @property
     def strategy_weights(self) -> Sequence[float]:
         return self._selector.weights
@@ -61,19 +114,59 @@ class Role:
     def strategy_weights(self, value: Sequence[float]) -> None:
         self._selector.weights = value
 
+    @property
+    def new_reveals(self) -> Sequence[tuple[int, int]]:
+        """
+        The positions discovered by the latest move.
+        Caches can be updated with them instead of rescanning the whole map.
+        """
+        return self._new_reveals
+
     def revealed(self, pos: tuple[int, int]) -> bool:
         """
         Reveal a new position, which means the role has known its terrain.
         """
-        return self._revealed[pos[0]][pos[1]]
+        return self._vision is None or self._revealed.get(*pos) != 0
+
+    def revealed_cell(self, cell: int) -> bool:
+        """
+        Check if a cell has been discovered like `revealed`.
+        """
+        return self._vision is None or self._revealed.get_cell(cell) != 0
+
+    @property
+    def revealed_layer(self) -> Optional['gm.Layer']:
+        """
+        Whether each position has been discovered. `None` means the role can see the whole map.
+        """
+        return self._revealed
 
-    def move(self) -> bool:
+    @property
+    def reveal_epoch(self) -> int:
+        """
+        The number of moves that have discovered new positions.
+        It changes whenever the role's knowledge of terrains changes.
+        """
+        return self._reveal_epoch
+
+    def move(self, action: Optional[Action] = None) -> bool:
         """
         Move one step.
+
+        -- PARAMETERS --
+        action: The action to take, such as one sent by an external controller. `None` means the role chooses one.
         """
-        action = self.peek_action()
-        dest = action.dest(self._pos)
-        ret = self._try_move(dest)
+        if self._bush_trapped:
+            # Lost this turn because of being trapped, so there is no need to choose an action.
+            self._bush_trapped = False
+            self._prev_try_cell = self._cell
+            self._wall_blocked = False
+            self._new_reveals = []
+            return False
+
+        if action is None:
+            action = self.peek_action()
+        ret = self._try_move(self._map.moves[action][self._cell])
         self._reveal()
         return ret
 
@@ -82,10 +175,23 @@ class Role:
         Choose the next action.
         """
         lvl_matrix = []
-        for strategy in self._strategies:
-            lvl_matrix.append(strategy.action_lvls(self._status))
+        for i, strategy in enumerate(self._strategies):
+            # Reuse the previous result until the state the strategy depends on changes.
+            key = strategy.dependency_key(self._status)
+            cache = self._lvl_cache.get(i)
+            if key is not None and cache is not None and cache[0] == key:
+                lvl_matrix.append(cache[1])
+                continue
+
+            lvls = strategy.action_lvls(self._status)
+            if key is not None:
+                self._lvl_cache[i] = (key, lvls)
+            lvl_matrix.append(lvls)
         # Get the action with the highest level of recommendation.
-        return self._selector.highest(lvl_matrix)
+        action = self._selector.highest(lvl_matrix)
+        if self.decision_hook is not None:
+            self.decision_hook(self, lvl_matrix, action)
+        return action
 
     def terrain(self) -> 'gm.Terrain':
         """
@@ -97,9 +203,8 @@ class Role:
         """
         Check whether the role is stuck.
         """
-        for action in Action:
-            dest = action.dest(self._pos)
-            if self._map.occupied(*dest, self._status) == gm.Occupy.NONE:
+        for moves in self._map.moves:
+            if self._map.occupied_cell(moves[self._cell], self._status) == gm.Occupy.NONE:
                 return False
         return True
 
@@ -107,52 +212,82 @@ class Role:
         """
         Update terrains.
         """
-        x, y = self._pos
-        self._revealed[x][y] = True
+        self._new_reveals = []
+        if self._vision is None:
+            return
+
+        def visit(x: int, y: int) -> None:
+            if self._map.valid(x, y) and not self._revealed.get(x, y):
+                self._revealed.set(x, y, self._REVEALED)
+                self._new_reveals.append((x, y))
+
+        # Terrains never change, so the field of view of a position only needs to be scanned once.
+        # A new position is scanned whole in O(r²) rather than only the frontier of the previous field of view,
+        # since one step can uncover positions inside the previous radius that walls hid.
+        if not self._revealed.get(*self._pos) & self._VIEWED:
+            self._vision.scan(self._pos, visit)
+            self._revealed.set(*self._pos, self._REVEALED | self._VIEWED)
         if self._wall_blocked:
-            prev_x, prev_y = self._prev_try_pos
-            self._revealed[prev_x][prev_y] = True
-
-    def _try_move(self, pos: tuple[int, int]) -> bool:
+            visit(*self._map.pos(self._prev_try_cell))
+
+        if len(self._new_reveals) > 0:
+            self._reveal_epoch += 1
+            for strategy in self._strategies:
+                strategy.on_reveal(self._new_reveals)
+
+            events = self._status.events
+            if events.active:
+                cells = tuple(self._new_reveals)
+                events.emit(Event(EventType.REVEALED, self.name(), cells))
+                walls = tuple(pos for pos in cells if self._map.wall(*pos))
+                if len(walls) > 0:
+                    events.emit(Event(EventType.WALL_DISCOVERED, self.name(), walls))
+
+    def _try_move(self, cell: int) -> bool:
         """
-        Try to move to the destination.
+        Try to move to the cell ID of the destination. -1 means a destination out of the map.
         """
-        self._prev_try_pos = pos
+        self._prev_try_cell = cell
         self._wall_blocked = False
-        if self._pos == pos:
+        if self._cell == cell:
             return True
         elif self._bush_trapped:
             # Lost this turn because of being trapped.
             self._bush_trapped = False
             return False
 
-        occupy = self._map.occupied(*pos, self._status)
+        occupy = self._map.occupied_cell(cell, self._status)
         if occupy != gm.Occupy.NONE:
             self._wall_blocked = occupy == gm.Occupy.WALL
             return False
         else:
+            pos = self._map.pos(cell)
+            self._cell = cell
             self._pos = pos
             self._bush_trapped = self._map.terrain(*pos) == gm.Terrain.BUSH
+
+            events = self._status.events
+            if events.active:
+                events.emit(Event(EventType.MOVED, self.name(), (pos,)))
+                if self._bush_trapped:
+                    events.emit(Event(EventType.BUSH_TRAPPED, self.name(), (pos,)))
             return True
 
 
 class Agent(Role):
+    __slots__ = ()
+
     def __init__(self, status: 'gm.Status', map: 'gm.Map', pos: tuple[int, int]) -> None:
         super().__init__(status, map, pos)
-        self._revealed = [[True] * map.height for _ in range(map.width)]
         self._load_strategies()
 
-    def _reveal(self) -> None:
-        pass
+    @staticmethod
+    def name() -> str:
+        return "agent"
 
     def _load_strategies(self) -> None:
         weights = []
-        for s, w in cfg.strategy_weights("agent").items():
-            if w < 0:
-                raise ValueError("Invalid strategy weight.")
-            elif w == 0:
-                continue
-
+        for s, w in self._cfg.strategies(self.name()):
             if s == sg.Random.name():
                 self._strategies.append(sg.Random(self))
             elif s == sg.MoveAway.name():
@@ -172,34 +307,43 @@ class Agent(Role):
 
 
 class Enemy(Role):
+    __slots__ = ("_planner",)
+
     def __init__(self, status: 'gm.Status', map: 'gm.Map', pos: tuple[int, int]) -> None:
         super().__init__(status, map, pos)
-        self._a_star: sg.AStar = None
+        self._planner: sg.PathFinder = None
         self._load_strategies()
 
+    @staticmethod
+    def name() -> str:
+        return "enemy"
+
+    @property
+    def planner(self) -> Optional['sg.PathFinder']:
+        """
+        The path-finding strategy if there is one.
+        """
+        return self._planner
+
     @property
     def path(self) -> list[tuple[int, int]]:
         """
-        Get the A* path if it exists.
+        Get the rest of the planned path if it exists.
         """
-        if not self._a_star:
-            return []
-        prev_path = self._a_star.prev_path
-        try:
-            begin = prev_path.index(self._pos)
-            path = prev_path[begin:]
-            return path
-        except ValueError:
+        if not self._planner:
             return []
+        cursor = self._planner.cursor
+        return self._planner.prev_path[cursor:] if cursor >= 0 else []
+
+    def on_path(self, pos: tuple[int, int]) -> bool:
+        """
+        Check if a position is on the rest of the planned path in constant time.
+        """
+        return self._planner is not None and self._planner.on_path(pos)
 
     def _load_strategies(self) -> None:
         weights = []
-        for s, w in cfg.strategy_weights("enemy").items():
-            if w < 0:
-                raise ValueError("Invalid strategy weight.")
-            elif w == 0:
-                continue
-
+        for s, w in self._cfg.strategies(self.name()):
             if s == sg.Random.name():
                 self._strategies.append(sg.Random(self))
             elif s == sg.MoveAway.name():
@@ -209,8 +353,17 @@ class Enemy(Role):
             elif s == sg.WallDensity.name():
                 self._strategies.append(sg.WallDensity(self))
             elif s == sg.AStar.name():
-                self._a_star = sg.AStar(self)
-                self._strategies.append(self._a_star)
+                self._planner = sg.AStar(self)
+                self._strategies.append(self._planner)
+            elif s == sg.HpaStar.name():
+                self._planner = sg.HpaStar(self)
+                self._strategies.append(self._planner)
+            elif s == sg.JumpPointSearch.name():
+                self._planner = sg.JumpPointSearch(self)
+                self._strategies.append(self._planner)
+            elif s == at.NAME:
+                self._planner = at.create_planner(self)
+                self._strategies.append(self._planner)
             else:
                 raise ValueError("Invalid action strategy.")
             weights.append(w)
@@ -1,63 +1,26 @@
+import heapq
+import math
+from array import array
 from random import randint
-from collections.abc import Sequence
+from collections.abc import Hashable, Sequence
+from typing import Optional
 
-from game import cfg
+from config import Config
+from game import kernels
 from game.action import Action
-from grid import Grid
+from game.hpa import ClusterGraph
 import game.map as gm
 import game.role as gr
 
 ActionLevels = dict[Action, float]
 
 
-class _Spot:
-    """
-    Used by A* path-finding.
-    """
-    def __init__(self, x: int, y: int) -> None:
-        self._pos: tuple[int, int] = (x, y)
-        self.prev: '_Spot' = None
-
-        self.g: float = 0
-        self.h: float = 0
-
-    @property
-    def pos(self) -> tuple[int, int]:
-        return self._pos
-
-    @property
-    def x(self) -> int:
-        return self._pos[0]
-
-    @property
-    def y(self) -> int:
-        return self._pos[1]
-
-    @property
-    def f(self) -> float:
-        return self.g + self.h
-
-    def clear(self) -> None:
-        self.prev = None
-        self.g = 0
-        self.h = 0
-
-    def retrace(self) -> list['_Spot']:
-        """
-        Retrace the path to the current spot.
-        """
-        path = [self]
-        spot = self
-        while spot.prev:
-            path.insert(0, spot.prev)
-            spot = spot.prev
-        return path
-
-
 class Strategy:
     """
     The interface of action strategy.
     """
+    __slots__ = ("_role", "_cfg", "_arrays")
+
     MAX_ACTION_LVL: float = 10
 
     @staticmethod
@@ -69,6 +32,10 @@ class Strategy:
 
     def __init__(self, role: 'gr.Role') -> None:
         self._role: 'gr.Role' = role
+        self._cfg: Config = role.cfg
+
+        # The arrays of the role's knowledge used by compiled kernels, created on first use.
+        self._arrays: Optional[tuple] = None
 
     def action_lvls(self, status: 'gm.Status') -> ActionLevels:
         """
@@ -77,15 +44,37 @@ class Strategy:
         """
         assert False
 
+    def dependency_key(self, status: 'gm.Status') -> Optional[Hashable]:
+        """
+        Get a key of the state that the recommendation depends on.
+        The previous result will be reused until the key changes. `None` means it should never be reused.
+        """
+        return None
+
+    def on_reveal(self, cells: Sequence[tuple[int, int]]) -> None:
+        """
+        Called after the role has discovered new positions.
+        Subclasses can override it to update their caches.
+        """
+        pass
+
+    def _knowledge(self) -> tuple:
+        """
+        Get the arrays of terrains and the positions discovered by the role, passed to compiled kernels.
+        """
+        if self._arrays is None:
+            self._arrays = kernels.knowledge(self._role.map, self._role.revealed_layer)
+        return self._arrays
+
     def _delete_invalid(self, lvls: ActionLevels) -> ActionLevels:
         """
         Delete invalid actions.
         """
-        for action in Action:
-            dest = action.dest(self._role.pos)
-            invalid = not self._role.map.valid(*dest)
-            wall = not invalid and self._role.revealed(dest) and self._role.map.wall(*dest)
-            if invalid or wall:
+        role, cell = self._role, self._role.cell
+        map = role.map
+        for action, moves in zip(Action, map.moves):
+            dest = moves[cell]
+            if dest < 0 or (role.revealed_cell(dest) and map.wall_cell(dest)):
                 lvls[action] = 0
         return lvls
 
@@ -94,6 +83,8 @@ class ActionSelector:
     """
     Choose the action according to the specific weights.
     """
+    __slots__ = ("weights",)
+
     @staticmethod
     def equality(strategy_num: int) -> 'ActionSelector':
         """
@@ -140,6 +131,8 @@ class Random(Strategy):
     """
     Choose an action randomly.
     """
+    __slots__ = ()
+
     @staticmethod
     def name() -> str:
         return "random"
@@ -163,10 +156,16 @@ class MoveAway(Strategy):
     """
     Choose an action to move away to the target.
     """
+    __slots__ = ()
+
     @staticmethod
     def name() -> str:
         return "moveAway"
 
+    def dependency_key(self, status: 'gm.Status') -> Optional[Hashable]:
+        # Invalid actions are deleted according to the revealed positions.
+        return self._role.pos, status.opponent(self._role).pos, self._role.reveal_epoch
+
     def action_lvls(self, status: 'gm.Status') -> ActionLevels:
         target = status.opponent(self._role)
         lvls = self.new_init_lvls()
@@ -186,10 +185,16 @@ class MoveClose(Strategy):
     """
     Choose an action to move closer to the target.
     """
+    __slots__ = ()
+
     @staticmethod
     def name() -> str:
         return "moveClose"
 
+    def dependency_key(self, status: 'gm.Status') -> Optional[Hashable]:
+        # Invalid actions are deleted according to the revealed positions.
+        return self._role.pos, status.opponent(self._role).pos, self._role.reveal_epoch
+
     def action_lvls(self, status: 'gm.Status') -> ActionLevels:
         target = status.opponent(self._role)
         lvls = self.new_init_lvls()
@@ -209,12 +214,23 @@ class WallDensity(Strategy):
     """
     Find a direction where the density of walls is lower.
     """
+    __slots__ = ("jit",)
+
     _RANGE: int = 5
 
     @staticmethod
     def name() -> str:
         return "wallDensity"
 
+    def __init__(self, role: 'gr.Role') -> None:
+        super().__init__(role)
+
+        # Whether to use the compiled kernel, which needs a dense map.
+        self.jit: bool = kernels.AVAILABLE and role.map.dense
+
+    def dependency_key(self, status: 'gm.Status') -> Optional[Hashable]:
+        return self._role.pos, self._role.reveal_epoch
+
     def action_lvls(self, status: 'gm.Status') -> ActionLevels:
         lvls = self.new_init_lvls()
         for action in Action:
@@ -242,6 +258,11 @@ class WallDensity(Strategy):
         else:
             return Strategy.MAX_ACTION_LVL
 
+        if self.jit:
+            map = self._role.map
+            total, wall = kernels.wall_count(*self._knowledge(), map.width, map.height, *begin, *end)
+            return round(wall / total, 2)
+
         total, wall = 1, 1
         for x in range(begin[0], end[0]):
             for y in range(begin[1], end[1]):
@@ -251,104 +272,596 @@ class WallDensity(Strategy):
         return round(wall / total, 2)
 
 
-class AStar(Strategy):
+class PathFinder(Strategy):
     """
-    A* path-finding.
+    The interface of path-finding strategies.
+    They recommend the next step of a path from the role to its opponent.
     """
-    @staticmethod
-    def name() -> str:
-        return "aStar"
+    __slots__ = ("_prev_path", "_path_index", "_path_blocked", "_target", "follow", "_max_drift", "_step", "_grass_cost",
+                 "expanded", "searches", "total_expanded")
 
     def __init__(self, role: 'gr.Role') -> None:
         super().__init__(role)
-        self._prev_path: list[_Spot] = []
+        self._prev_path: list[tuple[int, int]] = []
+
+        # The index of each position on the previous path, so the role can be located on it in constant time.
+        self._path_index: dict[tuple[int, int], int] = {}
+
+        # Whether a wall or a more costly terrain has been discovered on the previous path.
+        self._path_blocked: bool = False
 
-        spots = [[None] * role.map.height for _ in range(role.map.width)]
-        for x in range(role.map.width):
-            for y in range(role.map.height):
-                spots[x][y] = _Spot(x, y)
-        self._grid: Grid = Grid(spots)
-        self._init_neighbors()
+        # The opponent's position when the previous path was found.
+        # It is not the end of the path if a planner only refines part of the way, such as `HpaStar`.
+        self._target: Optional[tuple[int, int]] = None
+
+        # Whether to follow the previous path until it becomes invalid, instead of searching on every move.
+        self.follow: bool = self._cfg.follow_path
+        self._max_drift: int = self._cfg.max_drift
+
+        # The heuristic distance of one step and the move cost of unrevealed positions.
+        self._step: float = self._cfg.heuristic((0, 0), (0, 1))
+        self._grass_cost: float = self._cfg.move_costs[gm.Terrain.GRASS.value]
+
+        # The number of positions expanded by the latest search.
+        self.expanded: int = 0
+
+        # The number of searches and positions expanded by all of them.
+        self.searches: int = 0
+        self.total_expanded: int = 0
 
     @property
     def prev_path(self) -> list[tuple[int, int]]:
         """
         Get the previous path.
         """
-        return [spot.pos for spot in self._prev_path]
+        return self._prev_path
+
+    @property
+    def cursor(self) -> int:
+        """
+        The index of the role's position on the previous path, or `-1` if the role is not on it.
+        """
+        return self._path_index.get(self._role.pos, -1)
+
+    def on_path(self, pos: tuple[int, int]) -> bool:
+        """
+        Check if a position is on the rest of the previous path from the role.
+        """
+        cursor = self.cursor
+        return cursor >= 0 and self._path_index.get(pos, -1) >= cursor
+
+    def dependency_key(self, status: 'gm.Status') -> Optional[Hashable]:
+        return self._role.pos, status.opponent(self._role).pos, self._role.reveal_epoch
+
+    def on_reveal(self, cells: Sequence[tuple[int, int]]) -> None:
+        # Unrevealed positions have been treated as grass when the path was found.
+        cursor = self.cursor
+        for pos in cells:
+            if self._path_index.get(pos, -1) > cursor and self._role.map.move_cost(*pos) > self._grass_cost:
+                self._path_blocked = True
 
     def action_lvls(self, status: 'gm.Status') -> ActionLevels:
         lvls = self.new_init_lvls()
-        self._prev_path = self._path(status)
-        if len(self._prev_path) > 0:
-            action = Action.next(self._role.pos, self._prev_path[1].pos)
+        if not self.follow or not self._followable(status):
+            self._set_path(self._path(status), status.opponent(self._role).pos)
+            self.searches += 1
+            self.total_expanded += self.expanded
+
+        cursor = self.cursor
+        if 0 <= cursor < len(self._prev_path) - 1:
+            action = Action.next(self._role.pos, self._prev_path[cursor + 1])
             lvls[action] = Strategy.MAX_ACTION_LVL
         return lvls
 
-    def _path(self, status: 'gm.Status') -> list[_Spot]:
+    def _followable(self, status: 'gm.Status') -> bool:
+        """
+        Check if the previous path can still be followed.
+        The role should be on it, no wall or more costly terrain should have been discovered on its rest,
+        and the opponent should not have moved too far away from where it was when the path was found.
+        A partial path is followed to its end and then planned again.
+        """
+        cursor = self.cursor
+        if self._path_blocked or not 0 <= cursor < len(self._prev_path) - 1:
+            return False
+        prev, target = self._target, status.opponent(self._role).pos
+        return abs(prev[0] - target[0]) + abs(prev[1] - target[1]) <= self._max_drift
+
+    def _set_path(self, path: list[tuple[int, int]], target: tuple[int, int]) -> None:
+        self._prev_path = path
+        self._target = target
+        self._path_index = {pos: i for i, pos in enumerate(path)}
+        self._path_blocked = False
+
+    def _path(self, status: 'gm.Status') -> list[tuple[int, int]]:
         """
         Find a path to the opponent.
+        Subclasses should implement their logic.
+        """
+        assert False
+
+    def _move_cost(self, x: int, y: int) -> float:
         """
-        self._clear_spots()
-        heuristic = cfg.heuristic
-        open_set, closed_set = [], []
-
-        def next_pos() -> _Spot:
-            assert len(open_set) > 0
-            pos = min(open_set, key=lambda s: s.f)
-            open_set.remove(pos)
-            return pos
-
-        src = self._role.pos
-        dest = status.opponent(self._role).pos
-        open_set.append(self._grid.spot(*src))
-        while len(open_set) > 0:
-            spot = next_pos()
-            if spot.pos == dest:
-                return spot.retrace()
-            closed_set.append(spot)
-
-            for neighbor in self._grid.neighbors(*spot.pos):
-                if neighbor in closed_set:
+        Get the cost of moving onto a position according to the role's knowledge.
+        Unrevealed positions are treated as grass.
+        """
+        if not self._role.map.valid(x, y):
+            return math.inf
+        elif self._role.revealed((x, y)):
+            return self._role.map.move_cost(x, y)
+        else:
+            return self._grass_cost
+
+    def _step_cost(self, x: int, y: int) -> float:
+        """
+        Get the total cost of moving one step onto a position, including the heuristic distance of a step.
+        """
+        return self._step + self._move_cost(x, y)
+
+
+class AStar(PathFinder):
+    """
+    A* path-finding.
+    """
+    __slots__ = ("bidirectional", "jit", "_costs")
+
+    @staticmethod
+    def name() -> str:
+        return "aStar"
+
+    def __init__(self, role: 'gr.Role') -> None:
+        super().__init__(role)
+
+        # Whether to search from both the source and the destination.
+        self.bidirectional: bool = self._cfg.bidirectional
+
+        # Whether to use the compiled kernel for unidirectional search, which needs a dense map.
+        self.jit: bool = kernels.AVAILABLE and role.map.dense
+        self._costs = kernels.floats(self._cfg.move_costs) if kernels.AVAILABLE else None
+
+    def _path(self, status: 'gm.Status') -> list[tuple[int, int]]:
+        self.expanded = 0
+        if self.bidirectional:
+            return self._bidirectional_path(self._role.pos, status.opponent(self._role).pos)
+        elif self.jit:
+            return self._compiled_path(self._role.pos, status.opponent(self._role).pos)
+
+        map = self._role.map
+        if not map.dense:
+            return self._sparse_path(self._role.pos, status.opponent(self._role).pos)
+        width, size = map.width, map.width * map.height
+        terrains, costs, wall = map.terrains, self._cfg.move_costs, gm.Terrain.WALL.value
+        revealed = self._role.revealed_layer
+        revealed = revealed.cells if revealed is not None else None
+        # The neighbors of a position in the order they are searched.
+        moves = [map.moves[action] for action in (Action.RIGHT, Action.LEFT, Action.UP, Action.DOWN)]
+
+        # The records of each position are kept in flat arrays indexed in row-major order,
+        # which only live during a search, instead of an object per position.
+        g = array("d", bytes(8 * size))
+        prev = array("l", [-1]) * size
+        # 0 means unvisited, 1 means in the open list and 2 means expanded.
+        state = bytearray(size)
+
+        dest_id = status.opponent(self._role).cell
+        open_list = [self._role.cell]
+        state[open_list[0]] = 1
+        while len(open_list) > 0:
+            # The first position with the lowest cost in insertion order.
+            i = min(open_list, key=g.__getitem__)
+            open_list.remove(i)
+            if i == dest_id:
+                path = []
+                while i != -1:
+                    path.append((i % width, i // width))
+                    i = prev[i]
+                path.reverse()
+                return path
+            state[i] = 2
+            self.expanded += 1
+
+            for neighbors in moves:
+                n = neighbors[i]
+                if n < 0 or state[n] == 2:
                     continue
-                new_g = spot.g + heuristic(spot.pos, neighbor.pos)
-                if self._role.revealed(neighbor.pos):
-                    if self._role.map.wall(*neighbor.pos):
-                        self._grid.delete(*neighbor.pos)
+                new_g = g[i] + self._step
+                if revealed is None or revealed[n]:
+                    if terrains[n] == wall:
                         continue
-                    else:
-                        new_g += self._role.map.move_cost(*neighbor.pos)
+                    new_g += costs[terrains[n]]
                 else:
-                    new_g += cfg.move_cost["grass"]
+                    new_g += self._grass_cost
 
-                new_path = False
-                if neighbor in open_set:
-                    if new_g < neighbor.g:
-                        neighbor.g = new_g
-                        new_path = True
+                if state[n] == 0:
+                    state[n] = 1
+                    open_list.append(n)
+                elif new_g >= g[n]:
+                    continue
+                g[n] = new_g
+                prev[n] = i
+        return []
+
+    def _sparse_path(self, src: tuple[int, int], dest: tuple[int, int]) -> list[tuple[int, int]]:
+        """
+        Find a path like the flat search, but keep the records in dictionaries for maps that are not dense.
+        A flood from the destination runs alongside, so an enclosed destination fails once its enclosure
+        is exhausted instead of after the whole map is searched. It stops when it meets the search,
+        since passability is symmetric.
+        """
+        offsets = [action.offset for action in (Action.RIGHT, Action.LEFT, Action.UP, Action.DOWN)]
+        g = {src: 0.0}
+        prevs: dict[tuple[int, int], tuple[int, int]] = {}
+        closed = set()
+        open_list = [src]
+        flood, flooded = [dest], {dest}
+        while len(open_list) > 0:
+            if len(flood) > 0:
+                x, y = flood.pop()
+                for dx, dy in offsets:
+                    neighbor = (x + dx, y + dy)
+                    if neighbor in g:
+                        flood.clear()
+                        break
+                    if neighbor not in flooded and self._move_cost(*neighbor) < math.inf:
+                        flooded.add(neighbor)
+                        flood.append(neighbor)
                 else:
-                    neighbor.g = new_g
-                    new_path = True
-                    open_set.append(neighbor)
+                    if len(flood) == 0:
+                        return []
+
+            # The first position with the lowest cost in insertion order.
+            pos = min(open_list, key=g.__getitem__)
+            open_list.remove(pos)
+            if pos == dest:
+                path = [pos]
+                while path[-1] in prevs:
+                    path.append(prevs[path[-1]])
+                path.reverse()
+                return path
+            closed.add(pos)
+            self.expanded += 1
+
+            x, y = pos
+            for dx, dy in offsets:
+                neighbor = (x + dx, y + dy)
+                if neighbor in closed:
+                    continue
+                cost = self._step_cost(*neighbor)
+                if cost == math.inf:
+                    continue
+                new_g = g[pos] + cost
+                if neighbor not in g:
+                    open_list.append(neighbor)
+                elif new_g >= g[neighbor]:
+                    continue
+                g[neighbor] = new_g
+                prevs[neighbor] = pos
+        return []
+
+    def _compiled_path(self, src: tuple[int, int], dest: tuple[int, int]) -> list[tuple[int, int]]:
+        """
+        Find a path with the compiled kernel, which makes the same decisions as unidirectional search.
+        """
+        map = self._role.map
+        cells, self.expanded = kernels.a_star(*self._knowledge(), map.width, map.height,
+                                              self._costs, float(self._grass_cost), float(self._step),
+                                              src[1] * map.width + src[0], dest[1] * map.width + dest[0])
+        return [(c % map.width, c // map.width) for c in cells.tolist()]
+
+    def _bidirectional_path(self, src: tuple[int, int], dest: tuple[int, int]) -> list[tuple[int, int]]:
+        """
+        Find a path by searching from both the source and the destination until they meet in the middle.
+        Costs are asymmetric because only the position moved onto is charged,
+        so the backward search charges an edge with the cost of the position it leaves.
+        """
+        heuristic = self._cfg.heuristic
+        # The lower bound of the cost of each step, used to scale the heuristic distance.
+        scale = (self._step + min(self._cfg.move_costs)) / self._step
+        targets = (dest, src)
+
+        g: tuple[dict, dict] = ({src: 0.0}, {dest: 0.0})
+        prevs: tuple[dict, dict] = ({}, {})
+        closed: tuple[set, set] = (set(), set())
+        heaps = ([(heuristic(src, dest) * scale, 0, src)], [(heuristic(dest, src) * scale, 0, dest)])
+        counter = 0
+        best, meet = math.inf, None
+        while len(heaps[0]) > 0 and len(heaps[1]) > 0:
+            # No path through unexpanded positions can be shorter than the best one.
+            if best <= max(heaps[0][0][0], heaps[1][0][0]):
+                break
+
+            # Expand the smaller frontier.
+            side = 0 if len(heaps[0]) <= len(heaps[1]) else 1
+            _, _, pos = heapq.heappop(heaps[side])
+            if pos in closed[side]:
+                continue
+            closed[side].add(pos)
+            self.expanded += 1
+
+            x, y = pos
+            back_cost = self._step_cost(x, y) if side == 1 else 0
+            for neighbor in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+                cost = self._step_cost(*neighbor)
+                if cost == math.inf or neighbor in closed[side]:
+                    continue
+                new_g = g[side][pos] + (cost if side == 0 else back_cost)
+                if new_g < g[side].get(neighbor, math.inf):
+                    g[side][neighbor] = new_g
+                    prevs[side][neighbor] = pos
+                    counter += 1
+                    heapq.heappush(heaps[side], (new_g + heuristic(neighbor, targets[side]) * scale, counter, neighbor))
+                    if neighbor in g[1 - side] and new_g + g[1 - side][neighbor] < best:
+                        best, meet = new_g + g[1 - side][neighbor], neighbor
+
+        if meet is None:
+            return []
+        path = [meet]
+        while path[-1] in prevs[0]:
+            path.append(prevs[0][path[-1]])
+        path.reverse()
+        while path[-1] in prevs[1]:
+            path.append(prevs[1][path[-1]])
+        return path
+
+
+class HpaStar(PathFinder):
+    """
+    Hierarchical path-finding (HPA*) for large maps.
+    The map is split into clusters, and only the first leg of the abstract path is refined.
+    """
+    __slots__ = ("_graph",)
+
+    @staticmethod
+    def name() -> str:
+        return "hpaStar"
+
+    def __init__(self, role: 'gr.Role') -> None:
+        super().__init__(role)
+        self._graph: ClusterGraph = ClusterGraph(role.map.width, role.map.height, self._cfg.cluster_size,
+                                                 self._step_cost, self._step + min(self._cfg.move_costs))
+
+    def on_reveal(self, cells: Sequence[tuple[int, int]]) -> None:
+        super().on_reveal(cells)
+        for x, y in cells:
+            # Unrevealed positions have been treated as grass.
+            if self._role.map.move_cost(x, y) != self._grass_cost:
+                self._graph.invalidate(x, y)
+
+    def _path(self, status: 'gm.Status') -> list[tuple[int, int]]:
+        path = self._graph.path(self._role.pos, status.opponent(self._role).pos)
+        self.expanded = self._graph.expanded
+        return path
+
 
-                if new_path:
-                    neighbor.g = new_g
-                    neighbor.prev = spot
+class JumpPointSearch(PathFinder):
+    """
+    Jump point search (JPS) on a 4-connected grid.
+    Straight runs of positions with the cost of grass, including unrevealed ones, are skipped without being expanded.
+    Jumps stop next to positions with other costs, such as bushes, which are expanded normally.
+    On chunked maps, a search is bounded by a box around the source and the destination,
+    which grows if no path is found in it, so jumps over unrevealed positions cannot run across the whole map.
+    """
+    __slots__ = ("_scale", "_dest", "_box", "_kinds", "_rows")
+
+    # The directions of moves.
+    _DIRECTIONS: tuple[tuple[int, int], ...] = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+    # The kinds of positions according to their move costs. Zero means the kind has not been computed.
+    _BLOCKED: int = 1
+    _UNIFORM: int = 2
+    _IRREGULAR: int = 3
+
+    # The initial and maximum margins around the source and the destination of a search on a chunked map.
+    _MARGIN: int = 16
+    _MAX_MARGIN: int = 256
+
+    @staticmethod
+    def name() -> str:
+        return "jps"
+
+    def __init__(self, role: 'gr.Role') -> None:
+        super().__init__(role)
+        # The lower bound of the cost of each step, used to scale the heuristic distance.
+        self._scale: float = (self._step + min(self._cfg.move_costs)) / self._step
+
+        # The destination of the current search.
+        self._dest: tuple[int, int] = None
+
+        # The area `[x0, x1) * [y0, y1)` searched, as `(x0, y0, x1, y1)`. Positions out of it are blocked.
+        self._box: tuple[int, int, int, int] = (0, 0, role.map.width, role.map.height)
+
+        # The kind of each visited position, which only changes when the position is discovered.
+        self._kinds: gm.Layer = role.map.new_layer()
+
+        # The results of horizontal jumps from each position of a row in a direction, computed on first use.
+        # Each one is the position where the jump ends and whether it is a jump point rather than an obstacle.
+        # They are indexed from the left of the box.
+        self._rows: dict[tuple[int, int], list[tuple[int, bool]]] = {}
+
+    def on_reveal(self, cells: Sequence[tuple[int, int]]) -> None:
+        super().on_reveal(cells)
+        for pos in cells:
+            self._kinds.set(*pos, 0)
+        for x, y in cells:
+            # Unrevealed positions have been treated as grass.
+            # A different terrain changes the jumps of its row and the rows next to it.
+            if self._role.map.move_cost(x, y) != self._grass_cost:
+                for row in (y - 1, y, y + 1):
+                    self._rows.pop((row, 1), None)
+                    self._rows.pop((row, -1), None)
+
+    def _path(self, status: 'gm.Status') -> list[tuple[int, int]]:
+        self.expanded = 0
+        map = self._role.map
+        src, self._dest = self._role.pos, status.opponent(self._role).pos
+        if map.dense:
+            return self._search(src)
+
+        margin = self._MARGIN
+        while True:
+            # The box is aligned to the initial margin, so it and its cached rows rarely change between moves.
+            align = self._MARGIN
+            box = (max((min(src[0], self._dest[0]) - margin) // align * align, 0),
+                   max((min(src[1], self._dest[1]) - margin) // align * align, 0),
+                   min(-(-(max(src[0], self._dest[0]) + margin + 1) // align) * align, map.width),
+                   min(-(-(max(src[1], self._dest[1]) + margin + 1) // align) * align, map.height))
+            if box != self._box:
+                self._box = box
+                self._rows.clear()
+            path = self._search(src)
+            if len(path) > 0 or margin >= self._MAX_MARGIN or box == (0, 0, map.width, map.height):
+                return path
+            margin *= 2
+
+    def _search(self, src: tuple[int, int]) -> list[tuple[int, int]]:
+        """
+        Search for a path to the destination in the box.
+        """
+        heuristic = self._cfg.heuristic
+
+        # Each open position is stored with the direction it was reached by, `None` meaning all directions are searched.
+        g: dict[tuple[int, int], float] = {src: 0.0}
+        prevs: dict[tuple[int, int], tuple[int, int]] = {}
+        closed: set[tuple[int, int]] = set()
+        heap = [(heuristic(src, self._dest) * self._scale, 0, src, None)]
+        counter = 0
+        while len(heap) > 0:
+            _, _, pos, direction = heapq.heappop(heap)
+            if pos == self._dest:
+                return self._retrace(prevs, pos)
+            if pos in closed:
+                continue
+            closed.add(pos)
+            self.expanded += 1
+
+            for next_dir in self._successor_directions(pos, direction):
+                jump = self._jump(pos, next_dir)
+                if jump is None or jump in closed:
+                    continue
+                # All positions skipped by a jump have the cost of grass.
+                distance = abs(jump[0] - pos[0]) + abs(jump[1] - pos[1])
+                new_g = g[pos] + (distance - 1) * (self._step + self._grass_cost) + self._step_cost(*jump)
+                if new_g < g.get(jump, math.inf):
+                    g[jump] = new_g
+                    prevs[jump] = pos
+                    counter += 1
+                    heapq.heappush(heap, (new_g + heuristic(jump, self._dest) * self._scale, counter, jump, next_dir))
         return []
 
-    def _init_neighbors(self) -> None:
+    def _kind(self, x: int, y: int) -> int:
+        """
+        Get the kind of a position according to the role's knowledge.
+        """
+        x0, y0, x1, y1 = self._box
+        if not (x0 <= x < x1 and y0 <= y < y1):
+            return self._BLOCKED
+        kind = self._kinds.get(x, y)
+        if kind == 0:
+            cost = self._move_cost(x, y)
+            kind = self._BLOCKED if cost == math.inf else self._UNIFORM if cost == self._grass_cost else self._IRREGULAR
+            self._kinds.set(x, y, kind)
+        return kind
+
+    def _passable(self, x: int, y: int) -> bool:
+        return self._kind(x, y) != self._BLOCKED
+
+    def _uniform(self, x: int, y: int) -> bool:
+        """
+        Check if a position has the cost of grass.
+        """
+        return self._kind(x, y) == self._UNIFORM
+
+    def _irregular(self, x: int, y: int) -> bool:
         """
-        Initialize the neighbors of each spot.
+        Check if a position is passable but its cost is different from grass.
         """
-        for x in range(self._role.map.width):
-            for y in range(self._role.map.height):
-                self._grid.spot(x, y).neighbors = self._grid.neighbors(x, y)
+        return self._kind(x, y) == self._IRREGULAR
 
-    def _clear_spots(self) -> None:
+    def _successor_directions(self, pos: tuple[int, int],
+                              direction: Optional[tuple[int, int]]) -> Sequence[tuple[int, int]]:
         """
-        Clear the path-finding record.
+        Get the directions to search from an expanded position.
+        Positions reached by a jump only search forward and sideways.
+        The source, positions that are not grass and positions next to them search all directions.
         """
-        for x in range(self._role.map.width):
-            for y in range(self._role.map.height):
-                if self._grid.valid(x, y):
-                    self._grid.spot(x, y).clear()
+        x, y = pos
+        if direction is None or not self._uniform(x, y) \
+                or any(self._irregular(x + dx, y + dy) for dx, dy in self._DIRECTIONS):
+            return self._DIRECTIONS
+        return tuple(d for d in self._DIRECTIONS if d != (-direction[0], -direction[1]))
+
+    def _jump(self, pos: tuple[int, int], direction: tuple[int, int]) -> Optional[tuple[int, int]]:
+        """
+        Move from a position in a direction until reaching a jump point.
+
+        -- RETURN --
+        The jump point, or `None` if the direction leads nowhere.
+        """
+        dx, dy = direction
+        x, y = pos[0] + dx, pos[1] + dy
+        while True:
+            if not self._passable(x, y):
+                return None
+            elif (x, y) == self._dest or self._stop(x, y, dx, dy):
+                return x, y
+            elif dy != 0 and (self._jump_horizontally(x, y, 1) or self._jump_horizontally(x, y, -1)):
+                # A vertical jump stops where a horizontal one would find a jump point.
+                return x, y
+            x, y = x + dx, y + dy
+
+    def _jump_horizontally(self, x: int, y: int, dx: int) -> bool:
+        """
+        Check if a horizontal jump from a position finds a jump point.
+        """
+        end, found = self._row(y, dx)[x - self._box[0]]
+        dest_x, dest_y = self._dest
+        return found or (dest_y == y and (x < dest_x <= end if dx > 0 else end <= dest_x < x))
+
+    def _row(self, y: int, dx: int) -> list[tuple[int, bool]]:
+        """
+        Get the results of horizontal jumps from each position of a row in a direction, ignoring the destination.
+        """
+        row = self._rows.get((y, dx))
+        if row is None:
+            x0, _, x1, _ = self._box
+            row = [None] * (x1 - x0)
+            # Sweep against the direction, so each result is derived from the next position's one.
+            for x in (range(x1 - 1, x0 - 1, -1) if dx > 0 else range(x0, x1)):
+                next_x = x + dx
+                if not self._passable(next_x, y):
+                    row[x - x0] = (next_x, False)
+                elif self._stop(next_x, y, dx, 0):
+                    row[x - x0] = (next_x, True)
+                else:
+                    row[x - x0] = row[next_x - x0]
+            self._rows[(y, dx)] = row
+        return row
+
+    def _stop(self, x: int, y: int, dx: int, dy: int) -> bool:
+        """
+        Check if a jump in a direction should stop at a position.
+        It stops at positions that are not grass, positions next to them and positions with forced neighbors,
+        which can only be reached optimally through the position because an obstacle is behind them.
+        """
+        if not self._uniform(x, y) or any(self._irregular(x + ox, y + oy) for ox, oy in self._DIRECTIONS):
+            return True
+        elif dx != 0:
+            return (self._uniform(x, y - 1) and not self._uniform(x - dx, y - 1)) \
+                or (self._uniform(x, y + 1) and not self._uniform(x - dx, y + 1))
+        else:
+            return (self._uniform(x - 1, y) and not self._uniform(x - 1, y - dy)) \
+                or (self._uniform(x + 1, y) and not self._uniform(x + 1, y - dy))
+
+    @staticmethod
+    def _retrace(prevs: dict[tuple[int, int], tuple[int, int]], pos: tuple[int, int]) -> list[tuple[int, int]]:
+        """
+        Build a path by filling the straight runs between jump points.
+        """
+        path = [pos]
+        while pos in prevs:
+            prev = prevs[pos]
+            dx, dy = (prev[0] > pos[0]) - (prev[0] < pos[0]), (prev[1] > pos[1]) - (prev[1] < pos[1])
+            while pos != prev:
+                pos = (pos[0] + dx, pos[1] + dy)
+                path.append(pos)
+        path.reverse()
+        return path
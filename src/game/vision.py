@@ -0,0 +1,101 @@
+from collections.abc import Callable
+
+# A precomputed row of an octant: (dx, dy, left slope, right slope, within radius).
+_Row = tuple[tuple[int, int, float, float, bool], ...]
+
+
+class Vision:
+    """
+    The field of view of a role, computed by recursive shadowcasting.
+    """
+    # The multipliers (xx, xy, yx, yy) transforming the first octant into the others.
+    _OCTANTS: tuple[tuple[int, int, int, int], ...] = (
+        (1, 0, 0, 1), (0, 1, 1, 0), (0, -1, 1, 0), (-1, 0, 0, 1),
+        (-1, 0, 0, -1), (0, -1, -1, 0), (0, 1, -1, 0), (1, 0, 0, -1)
+    )
+
+    # The octant tables shared by all roles with the same radius.
+    _tables: dict[int, tuple[_Row, ...]] = {}
+
+    @classmethod
+    def table(cls, radius: int) -> tuple[_Row, ...]:
+        """
+        Get the precomputed octant table of a radius.
+        The row `j` contains the cells at the depth `j + 1` with their slopes,
+        so casting light never needs to calculate them again.
+        """
+        if radius not in cls._tables:
+            rows = []
+            for depth in range(1, radius + 1):
+                row = []
+                dy = -depth
+                for dx in range(-depth, 1):
+                    l_slope = (dx - 0.5) / (dy + 0.5)
+                    r_slope = (dx + 0.5) / (dy - 0.5)
+                    row.append((dx, dy, l_slope, r_slope, dx * dx + dy * dy <= radius * (radius + 1)))
+                rows.append(tuple(row))
+            cls._tables[radius] = tuple(rows)
+        return cls._tables[radius]
+
+    def __init__(self, radius: int, opaque: Callable[[int, int], bool]) -> None:
+        """
+        The constructor.
+
+        -- PARAMETERS --
+        radius: The vision radius.
+        opaque: Check if a position blocks the line of sight.
+        """
+        assert radius >= 0
+        self._radius: int = radius
+        self._opaque: Callable[[int, int], bool] = opaque
+        self._table: tuple[_Row, ...] = self.table(radius)
+
+    @property
+    def radius(self) -> int:
+        return self._radius
+
+    def scan(self, center: tuple[int, int], visit: Callable[[int, int], None]) -> None:
+        """
+        Visit every position in the field of view of a center, including the center itself.
+        A position may be visited more than once.
+        """
+        visit(*center)
+        if self._radius == 0:
+            return
+        for octant in self._OCTANTS:
+            self._cast(center, 1, 1.0, 0.0, octant, visit)
+
+    def _cast(self, center: tuple[int, int], depth: int, start: float, end: float,
+              octant: tuple[int, int, int, int], visit: Callable[[int, int], None]) -> None:
+        """
+        Cast light into an octant from a depth between two slopes.
+        """
+        if start < end:
+            return
+        cx, cy = center
+        xx, xy, yx, yy = octant
+        new_start = start
+        for j in range(depth, self._radius + 1):
+            blocked = False
+            for dx, dy, l_slope, r_slope, lit in self._table[j - 1]:
+                if start < r_slope:
+                    continue
+                elif end > l_slope:
+                    break
+
+                x, y = cx + dx * xx + dy * xy, cy + dx * yx + dy * yy
+                if lit:
+                    visit(x, y)
+                if blocked:
+                    if self._opaque(x, y):
+                        new_start = r_slope
+                    else:
+                        blocked = False
+                        start = new_start
+                elif self._opaque(x, y) and j < self._radius:
+                    # A shadow begins, scan the light part before it at the next depth.
+                    blocked = True
+                    self._cast(center, j + 1, start, l_slope, octant, visit)
+                    new_start = r_slope
+            if blocked:
+                break
@@ -0,0 +1,6 @@
+from game import kernels
+
+# Importing this module compiles the kernels or loads them from Numba's cache.
+# Fork servers of worker pools preload it, so every worker forked afterwards starts with them ready.
+
+kernels.warm_up()
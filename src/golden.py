@@ -0,0 +1,315 @@
+import argparse
+import json
+import logging
+import struct
+import sys
+import time
+import zlib
+from array import array
+from collections.abc import Callable, Iterator, Sequence
+from pathlib import Path
+from random import seed
+from typing import NamedTuple, Optional
+
+import game.autotune as autotune
+import game.strategy as sg
+from batch import WorkerPool
+from config import Config, DEFAULT_PATH
+from game import kernels
+from game.action import Action
+from game.map import Status
+from game.role import Role
+from simulation import new_game, next_step
+
+# Golden decision traces of games, used to verify that an optimized engine plays exactly the same games.
+# A trace records every decision: the chosen action, a digest of the action levels of each strategy
+# and a digest of the enemy's planned path. Traces of a candidate backend are compared with recorded ones
+# and the first divergence is reported.
+
+_MAGIC: bytes = b"CHGT"
+_VERSION: int = 1
+
+# The magic number, the version, the length of the configuration and the number of games.
+_HEADER = struct.Struct("<4sHII")
+
+# The random seed, the score, the number of steps and the number of decisions of a game.
+_GAME = struct.Struct("<qIII")
+
+# The step, the role, the action, the digest of action levels and the digest of the planned path of a decision.
+_DECISION = struct.Struct("<IBBII")
+
+# The roles indexed in decisions.
+_ROLES: tuple[str, ...] = ("agent", "enemy")
+
+# The number of decimals action levels are rounded to before digesting them,
+# so backends computing the same levels with different floating-point rounding are not reported.
+_DECIMALS: int = 6
+
+
+def _use_kernels(enabled: bool) -> Callable[[Status], None]:
+    def prepare(status: Status) -> None:
+        for role in (status.agent, status.enemy):
+            for strategy in role.strategies:
+                if isinstance(strategy, (sg.AStar, sg.WallDensity)):
+                    strategy.jit = enabled and kernels.AVAILABLE and role.map.dense
+    return prepare
+
+
+# The backends that games can be played with. Each one prepares a new game before it starts.
+BACKENDS: dict[str, Callable[[Status], None]] = {
+    # The configured implementation.
+    "default": lambda status: None,
+    # Pure-Python code only.
+    "python": _use_kernels(False),
+    # Compiled kernels when Numba is installed.
+    "compiled": _use_kernels(True)
+}
+
+
+class Decision(NamedTuple):
+    step: int
+    role: str
+    action: Action
+    levels: int
+    path: int
+
+
+class Trace(NamedTuple):
+    """
+    The decisions of a game, packed into bytes.
+    """
+    seed: int
+    score: int
+    steps: int
+    decisions: bytes
+
+    def __len__(self) -> int:
+        return len(self.decisions) // _DECISION.size
+
+    def decision(self, index: int) -> Decision:
+        step, role, action, levels, path = _DECISION.unpack_from(self.decisions, index * _DECISION.size)
+        return Decision(step, _ROLES[role], Action(action), levels, path)
+
+
+class Divergence(NamedTuple):
+    """
+    The first difference between a golden trace and a candidate one.
+    """
+    seed: int
+
+    # The index of the first different decision. `None` means all decisions are the same but the results differ.
+    index: Optional[int]
+
+    golden: Optional[Decision]
+    candidate: Optional[Decision]
+
+    def describe(self) -> str:
+        if self.index is None:
+            return f"Seed {self.seed}: the same decisions but different scores or steps."
+        elif self.golden is None or self.candidate is None:
+            extra = "golden" if self.candidate is None else "candidate"
+            return f"Seed {self.seed}: the {extra} game makes more than {self.index} decisions."
+        golden, candidate = self.golden, self.candidate
+        fields = [name for name in Decision._fields if getattr(golden, name) != getattr(candidate, name)]
+        return (f"Seed {self.seed}: decision {self.index} at step {golden.step} differs in {', '.join(fields)}. "
+                f"Golden: {golden.role} {golden.action.name}, candidate: {candidate.role} {candidate.action.name}.")
+
+
+class _Recorder:
+    """
+    Record the decisions of both roles of a game.
+    If `keep_levels` is set, the action levels of each decision are also kept for reports.
+    """
+    def __init__(self, status: Status, keep_levels: bool = False) -> None:
+        self._status: Status = status
+        self._decisions: bytearray = bytearray()
+        self.levels: Optional[list[dict[str, dict[str, float]]]] = [] if keep_levels else None
+        status.agent.decision_hook = self._record
+        status.enemy.decision_hook = self._record
+
+    @property
+    def decisions(self) -> bytes:
+        return bytes(self._decisions)
+
+    def _record(self, role: Role, lvl_matrix: Sequence[sg.ActionLevels], action: Action) -> None:
+        values = [round(lvls[a], _DECIMALS) for lvls in lvl_matrix for a in Action]
+        levels = zlib.crc32(struct.pack(f"<{len(values)}d", *values))
+        path = 0
+        if role is self._status.enemy and role.planner is not None:
+            path = zlib.crc32(array("i", [c for pos in role.planner.prev_path for c in pos]).tobytes())
+        self._decisions += _DECISION.pack(self._status.steps, _ROLES.index(role.name()), action, levels, path)
+        if self.levels is not None:
+            self.levels.append({strategy.name(): {a.name: lvls[a] for a in Action}
+                                for strategy, lvls in zip(role.strategies, lvl_matrix)})
+
+
+def play(cfg: Config, game_seed: int, backend: str = "default", keep_levels: bool = False) -> tuple[Trace, _Recorder]:
+    """
+    Play a game with a random seed like `simulation.play_seed` and record its decisions.
+    """
+    seed(game_seed)
+    status = new_game(cfg)
+    BACKENDS[backend](status)
+    recorder = _Recorder(status, keep_levels)
+    move_enemy = False
+    while not status.game_end:
+        next_step(status, move_enemy)
+        move_enemy = not move_enemy
+    return Trace(game_seed, status.score, status.steps, recorder.decisions), recorder
+
+
+def compare(golden: Trace, candidate: Trace) -> Optional[Divergence]:
+    """
+    Find the first divergence between two traces of the same game.
+    """
+    if golden.decisions == candidate.decisions:
+        if golden.score == candidate.score and golden.steps == candidate.steps:
+            return None
+        return Divergence(golden.seed, None, None, None)
+
+    for i in range(min(len(golden), len(candidate))):
+        begin, end = i * _DECISION.size, (i + 1) * _DECISION.size
+        if golden.decisions[begin:end] != candidate.decisions[begin:end]:
+            return Divergence(golden.seed, i, golden.decision(i), candidate.decision(i))
+    i = min(len(golden), len(candidate))
+    return Divergence(golden.seed, i, golden.decision(i) if i < len(golden) else None,
+                      candidate.decision(i) if i < len(candidate) else None)
+
+
+def _play_chunk(job: tuple[dict, str, Sequence[int]]) -> list[Trace]:
+    raw, backend, seeds = job
+    cfg = Config(raw)
+    return [play(cfg, game_seed, backend)[0] for game_seed in seeds]
+
+
+def _chunks(raw: dict, backend: str, seeds: Sequence[int], chunk_size: int) -> Iterator[tuple[dict, str, Sequence[int]]]:
+    for i in range(0, len(seeds), chunk_size):
+        yield raw, backend, seeds[i:i + chunk_size]
+
+
+def play_all(pool: WorkerPool, cfg: Config, seeds: Sequence[int], backend: str,
+             chunk_size: int = 50) -> Iterator[Trace]:
+    """
+    Play and record games in worker processes. Traces are yielded in the order of seeds.
+    """
+    for traces in pool.run(_play_chunk, _chunks(cfg.raw, backend, seeds, chunk_size)):
+        yield from traces
+
+
+def save(path: Path, cfg: Config, backend: str, traces: Sequence[Trace]) -> None:
+    """
+    Save traces with the configuration and the backend they were recorded with.
+    """
+    text = json.dumps({"backend": backend, "config": cfg.raw}).encode("utf-8")
+    with path.open("wb") as file:
+        file.write(_HEADER.pack(_MAGIC, _VERSION, len(text), len(traces)))
+        file.write(text)
+        for trace in traces:
+            file.write(_GAME.pack(trace.seed, trace.score, trace.steps, len(trace)))
+            file.write(trace.decisions)
+
+
+def load(path: Path) -> tuple[Config, str, list[Trace]]:
+    """
+    Load traces with the configuration and the backend they were recorded with.
+    """
+    data = path.read_bytes()
+    magic, version, text_len, count = _HEADER.unpack_from(data, 0)
+    if magic != _MAGIC:
+        raise ValueError("Invalid golden trace file.")
+    elif version != _VERSION:
+        raise ValueError(f"Unsupported golden trace version {version}.")
+    offset = _HEADER.size
+    info = json.loads(data[offset:offset + text_len].decode("utf-8"))
+    cfg, backend = Config(info["config"]), info["backend"]
+    offset += text_len
+    traces = []
+    for _ in range(count):
+        game_seed, score, steps, decisions = _GAME.unpack_from(data, offset)
+        offset += _GAME.size
+        size = decisions * _DECISION.size
+        traces.append(Trace(game_seed, score, steps, data[offset:offset + size]))
+        offset += size
+    return cfg, backend, traces
+
+
+def report(divergence: Divergence, golden: tuple[Config, str], candidate: tuple[Config, str]) -> None:
+    """
+    Print the first divergence with the action levels of both games, which are played again.
+
+    -- PARAMETERS --
+    divergence: The first divergence.
+    golden: The configuration and the backend of the golden game.
+    candidate: The configuration and the backend of the candidate game.
+    """
+    print(divergence.describe())
+    if divergence.index is None:
+        return
+    for name, (cfg, backend) in (("Golden", golden), ("Candidate", candidate)):
+        _, recorder = play(cfg, divergence.seed, backend, keep_levels=True)
+        if divergence.index < len(recorder.levels):
+            print(f"{name} action levels: {recorder.levels[divergence.index]}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Record golden decision traces and verify backends against them.")
+    parser.add_argument("--processes", type=int, default=None, help="The number of worker processes.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    record = subparsers.add_parser("record", help="Record golden traces.")
+    record.add_argument("output", type=Path, help="The trace file.")
+    record.add_argument("--config", type=Path, default=DEFAULT_PATH, help="The configuration file.")
+    record.add_argument("--games", type=int, default=1000, help="The number of games.")
+    record.add_argument("--seed", type=int, default=0, help="The random seed of the first game.")
+    record.add_argument("--backend", choices=BACKENDS, default="python", help="The reference backend.")
+
+    verify = subparsers.add_parser("verify", help="Replay a backend against golden traces.")
+    verify.add_argument("golden", type=Path, help="The trace file.")
+    verify.add_argument("--config", type=Path, default=None,
+                        help="An alternative configuration file. The recorded one is used by default.")
+    verify.add_argument("--backend", choices=BACKENDS, default="default", help="The candidate backend.")
+    args = parser.parse_args()
+
+    begin = time.perf_counter()
+    if args.command == "record":
+        cfg = Config.load(args.config)
+    else:
+        golden_cfg, golden_backend, golden = load(args.golden)
+        cfg = Config.load(args.config) if args.config is not None else golden_cfg
+    # Games are played with configurations sent to workers, so the automatic planner is calibrated for them here.
+    autotune.prepare(cfg)
+
+    with WorkerPool(args.processes) as pool:
+        if args.command == "record":
+            traces = list(play_all(pool, cfg, range(args.seed, args.seed + args.games), args.backend))
+            save(args.output, cfg, args.backend, traces)
+            print(f"Recorded {len(traces)} games with {sum(len(t) for t in traces)} decisions "
+                  f"in {time.perf_counter() - begin:.2f} s.")
+            return
+
+        divergences = 0
+        first = None
+        candidates = play_all(pool, cfg, [trace.seed for trace in golden], args.backend)
+        for trace, candidate in zip(golden, candidates):
+            divergence = compare(trace, candidate)
+            if divergence is not None:
+                divergences += 1
+                if first is None:
+                    first = divergence
+    print(f"Verified {len(golden)} games in {time.perf_counter() - begin:.2f} s, {divergences} diverged.")
+    if first is not None:
+        report(first, (golden_cfg, golden_backend), (cfg, args.backend))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger(__name__)
+
+    try:
+        main()
+    except SystemExit:
+        raise
+    except BaseException as err:
+        logger.exception(err)
+        sys.exit(1)
@@ -0,0 +1,224 @@
+import argparse
+import json
+import logging
+import math
+import random
+import statistics
+import sys
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Optional
+
+from batch import Weights, WorkerPool
+from config import Config, DEFAULT_PATH
+from corpus import MapCorpus
+
+logger = logging.getLogger(__name__)
+
+# The z-score of a two-sided 95% confidence interval.
+_Z: float = 1.96
+
+
+class Candidate:
+    """
+    A candidate of strategy weights and the scores of its games.
+    """
+    def __init__(self, weights: Weights, maximize: bool) -> None:
+        """
+        The constructor.
+
+        -- PARAMETERS --
+        weights: The strategy weights.
+        maximize: Whether a higher score is better, which is true when tuning the agent.
+        """
+        self.weights: Weights = weights
+        self.scores: list[int] = []
+        self._sign: int = 1 if maximize else -1
+
+    @property
+    def games(self) -> int:
+        return len(self.scores)
+
+    @property
+    def value(self) -> float:
+        """
+        The mean score, negated if a lower score is better.
+        """
+        return self._sign * statistics.fmean(self.scores) if self.games > 0 else -math.inf
+
+    def bounds(self) -> tuple[float, float]:
+        """
+        Get the confidence interval of `value`.
+        """
+        if self.games < 2:
+            return -math.inf, math.inf
+        margin = _Z * statistics.stdev(self.scores) / math.sqrt(self.games)
+        return self.value - margin, self.value + margin
+
+
+class Optimizer:
+    """
+    Search the strategy weights of a role with Hyperband.
+
+    Each bracket runs successive halving: all candidates play a few games, then only the better `1 / eta` of them
+    play `eta` times as many games, until one survives with the maximum budget.
+    Brackets trade the number of candidates against their initial budget.
+    Candidates whose confidence interval falls entirely below the best one are dropped at once,
+    and the search of a bracket stops early when the best candidate is separated from all others.
+    All candidates play the same random seeds, so they are compared on the same games.
+    """
+    def __init__(self, pool: WorkerPool, cfg: Config, role: str, min_games: int, max_games: int, eta: int = 3,
+                 seed: int = 0) -> None:
+        """
+        The constructor.
+
+        -- PARAMETERS --
+        pool: The worker pool playing games.
+        cfg: The configuration whose strategies are tuned.
+        role: The role to be tuned.
+        min_games: The minimum number of games played by a candidate.
+        max_games: The maximum number of games played by a candidate.
+        eta: The ratio of eliminated candidates in each round of successive halving.
+        seed: The random seed of sampling and the first game.
+        """
+        if not 0 < min_games <= max_games:
+            raise ValueError("Invalid number of games.")
+        elif eta < 2:
+            raise ValueError("Invalid elimination ratio.")
+
+        self._pool: WorkerPool = pool
+        self._role: str = role
+        self._strategies: tuple[str, ...] = tuple(cfg.strategy_weights(role).keys())
+        if len(self._strategies) == 0:
+            raise ValueError(f"The {role} has no strategy to be tuned.")
+
+        self._current: Weights = tuple(cfg.strategy_weights(role).items())
+        self._min_games: int = min_games
+        self._max_games: int = max_games
+        self._eta: int = eta
+        self._seed: int = seed
+        self._rand: random.Random = random.Random(seed)
+
+        # The total number of games played.
+        self.games: int = 0
+
+    def run(self) -> Candidate:
+        """
+        Run all brackets and get the best candidate.
+        """
+        rounds = int(math.log(self._max_games / self._min_games, self._eta) + 1e-9)
+        winners = []
+        for s in range(rounds, -1, -1):
+            count = math.ceil((rounds + 1) / (s + 1) * self._eta ** s)
+            candidates = [self._sample() for _ in range(count)]
+            if s == rounds:
+                # The current weights take part in the most explorative bracket.
+                candidates[0] = Candidate(self._current, self._maximize)
+            budget = max(self._max_games // self._eta ** s, self._min_games)
+            winner = self._halve(candidates, budget)
+            logger.info(f"Bracket {rounds - s}: {count} candidates, best {self._format(winner)}.")
+            winners.append(winner)
+        return self._halve(winners, self._max_games)
+
+    @property
+    def _maximize(self) -> bool:
+        return self._role == "agent"
+
+    def _sample(self) -> Candidate:
+        weights = tuple((s, round(self._rand.random(), 2)) for s in self._strategies)
+        if all(w == 0 for _, w in weights):
+            weights = ((weights[0][0], 1.0),) + weights[1:]
+        return Candidate(weights, self._maximize)
+
+    def _halve(self, candidates: list[Candidate], budget: int) -> Candidate:
+        """
+        Run successive halving from a budget until one candidate survives.
+        """
+        while True:
+            self._play(candidates, budget)
+            candidates.sort(key=lambda c: c.value, reverse=True)
+            best = candidates[0].bounds()[0]
+            # Drop the candidates that are worse than the best one with confidence.
+            candidates = [c for c in candidates if c is candidates[0] or c.bounds()[1] >= best]
+            if len(candidates) == 1 or budget >= self._max_games:
+                return candidates[0]
+            candidates = candidates[:max(len(candidates) // self._eta, 1)]
+            budget = min(budget * self._eta, self._max_games)
+
+    def _play(self, candidates: Sequence[Candidate], games: int) -> None:
+        """
+        Let candidates play more games until each of them has played `games` games.
+        """
+        jobs = [(i, self._role, c.weights, self._seed + g)
+                for i, c in enumerate(candidates) for g in range(c.games, games)]
+        for i, result in self._pool.play_weighted(jobs, chunk_size=4):
+            candidates[i].scores.append(result.score)
+        self.games += len(jobs)
+
+    def _format(self, candidate: Candidate) -> str:
+        low, high = candidate.bounds()
+        if not self._maximize:
+            low, high = -high, -low
+        return f"{dict(candidate.weights)} scored {abs(candidate.value):.2f} [{low:.2f}, {high:.2f}]"
+
+
+def distribution(scores: Sequence[int]) -> dict:
+    """
+    Summarize the distribution of scores.
+    """
+    mean = statistics.fmean(scores)
+    stdev = statistics.stdev(scores) if len(scores) > 1 else 0.0
+    margin = _Z * stdev / math.sqrt(len(scores))
+    quartiles = statistics.quantiles(scores, n=4) if len(scores) > 1 else [scores[0]] * 3
+    return {
+        "games": len(scores),
+        "mean": round(mean, 2),
+        "stdev": round(stdev, 2),
+        "ci95": [round(mean - margin, 2), round(mean + margin, 2)],
+        "min": min(scores),
+        "quartiles": [round(q, 2) for q in quartiles],
+        "max": max(scores)
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Search strategy weights with Hyperband over simulated games.")
+    parser.add_argument("role", choices=("agent", "enemy"),
+                        help="The role to be tuned. The agent maximizes the score and the enemy minimizes it.")
+    parser.add_argument("--config", type=Path, default=DEFAULT_PATH, help="The configuration file.")
+    parser.add_argument("--min-games", type=int, default=10, help="The minimum number of games per candidate.")
+    parser.add_argument("--max-games", type=int, default=270, help="The maximum number of games per candidate.")
+    parser.add_argument("--eta", type=int, default=3, help="The ratio of eliminated candidates in each round.")
+    parser.add_argument("--seed", type=int, default=0, help="The random seed of sampling and the first game.")
+    parser.add_argument("--processes", type=int, default=None, help="The number of worker processes.")
+    parser.add_argument("--corpus", type=int, default=0,
+                        help="The number of maps generated into shared memory and used by all games. "
+                             "Zero means every game generates its own map.")
+    args = parser.parse_args()
+
+    cfg = Config.load(args.config)
+    corpus: Optional[MapCorpus] = MapCorpus.create(cfg, args.corpus) if args.corpus > 0 else None
+    try:
+        with WorkerPool(args.processes, args.config, corpus.name if corpus else None) as pool:
+            optimizer = Optimizer(pool, cfg, args.role, args.min_games, args.max_games, args.eta, args.seed)
+            best = optimizer.run()
+    finally:
+        if corpus:
+            corpus.close()
+
+    weights = dict(cfg.raw["strategyWeights"])
+    weights[args.role] = dict(best.weights)
+    print(json.dumps({"strategyWeights": weights, "score": distribution(best.scores),
+                      "totalGames": optimizer.games}, indent=4))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    try:
+        main()
+    except SystemExit:
+        raise
+    except BaseException as err:
+        logger.exception(err)
+        sys.exit(1)
@@ -0,0 +1,190 @@
+import argparse
+import logging
+import multiprocessing as mp
+import os
+import sys
+import time
+from pathlib import Path
+from random import Random
+from typing import Optional
+
+import pygame as pg
+
+from config import Config, DEFAULT_PATH
+from displayer import Displayer
+from game.map import Map
+from simulation import Recording, record
+
+
+class Renderer(Displayer):
+    """
+    Render recorded games into image files without a window.
+    Images are chosen with the seed of a game, so a game is always rendered in the same way.
+    """
+    # The image formats that can be saved. Uncompressed formats are much faster to save than PNG.
+    FORMATS: tuple[str, ...] = ("png", "bmp", "tga")
+
+    def __init__(self, cfg: Config, zoom: float = 1) -> None:
+        super().__init__(cfg, zoom)
+        self._cfg: Config = cfg
+
+    def render(self, recording: Recording, dir: Path, begin: int = 0, end: Optional[int] = None,
+               format: str = "png") -> int:
+        """
+        Render frames into image files named by their indices.
+
+        -- PARAMETERS --
+        recording: The recorded game.
+        dir: The output directory.
+        begin: The first frame to render.
+        end: The frame after the last one to render. `None` means the end of the game.
+        format: The image format.
+
+        -- RETURN --
+        The number of rendered frames.
+        """
+        if format not in self.FORMATS:
+            raise ValueError(f"Unsupported image format '{format}'.")
+
+        map = Map(recording.width, recording.height, self._cfg, recording.terrains)
+        self._setup(map, Random(recording.seed).choice)
+        surf = pg.Surface(self.size(map)).convert()
+
+        frames = recording.frames
+        end = len(frames) if end is None else min(end, len(frames))
+        for i in range(end):
+            frame = frames[i]
+            # The discovered positions are accumulated from the first frame.
+            for x, y in frame.reveals:
+                self._revealed[x][y] = True
+            if i >= begin:
+                surf.fill(self._BG_COLOR)
+                self._draw_map(surf, set(frame.path).__contains__, frame.agent, frame.enemy, frame.game_end)
+                pg.image.save(surf, str(dir.joinpath(f"{i:05d}.{format}")))
+        return max(end - begin, 0)
+
+
+# The configuration and renderer of a worker process, created once when it starts.
+_worker_cfg: Optional[Config] = None
+_worker_renderer: Optional[Renderer] = None
+
+# The game recorded last by a worker process, reused by its other frame ranges.
+_worker_recording: Optional[Recording] = None
+
+
+def _init_worker(cfg_path: Path, zoom: float) -> None:
+    global _worker_cfg, _worker_renderer
+    # Sprites can only be converted after a display mode is set, which needs no window with the dummy driver.
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    pg.display.init()
+    pg.display.set_mode((1, 1))
+    _worker_cfg = Config.load(cfg_path)
+    _worker_renderer = Renderer(_worker_cfg, zoom)
+
+
+def _render(job: tuple[int, int, int, Path, str]) -> int:
+    """
+    Render a part of the frames of a game.
+    The game is played again from its seed, which costs much less than rendering.
+    """
+    global _worker_recording
+    game_seed, part, parts, out, format = job
+    if _worker_recording is None or _worker_recording.seed != game_seed:
+        _worker_recording = record(_worker_cfg, game_seed)
+
+    count = len(_worker_recording.frames)
+    dir = out.joinpath(str(game_seed))
+    dir.mkdir(parents=True, exist_ok=True)
+    return _worker_renderer.render(_worker_recording, dir, count * part // parts, count * (part + 1) // parts,
+                                   format)
+
+
+class RenderPool:
+    """
+    A pool of worker processes rendering games.
+    Each worker converts images once and renders a game or a range of its frames per job.
+    """
+    # The modules imported by the fork server before forking workers.
+    _PRELOAD: list[str] = ["pygame", "config", "assets", "displayer", "simulation", "game.map", "game.role", "game.strategy"]
+
+    def __init__(self, processes: Optional[int] = None, cfg_path: Path = DEFAULT_PATH, zoom: float = 1) -> None:
+        """
+        The constructor.
+
+        -- PARAMETERS --
+        processes: The number of worker processes. `None` means the number of CPUs.
+        cfg_path: The configuration file loaded by workers.
+        zoom: The zoom level of tiles.
+        """
+        if "forkserver" in mp.get_all_start_methods():
+            ctx = mp.get_context("forkserver")
+            ctx.set_forkserver_preload(self._PRELOAD)
+        else:
+            ctx = mp.get_context("spawn")
+        self._pool = ctx.Pool(processes, initializer=_init_worker, initargs=(cfg_path, zoom))
+
+    def __enter__(self) -> 'RenderPool':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def render(self, seeds: range, out: Path, parts: int = 1, format: str = "png") -> int:
+        """
+        Render games with random seeds into the subdirectories of `out` named by their seeds.
+
+        -- PARAMETERS --
+        seeds: The random seeds of games.
+        out: The output directory.
+        parts: The number of frame ranges a game is split into, which are rendered by different jobs.
+        format: The image format.
+
+        -- RETURN --
+        The number of rendered frames.
+        """
+        if parts <= 0:
+            raise ValueError("Invalid number of parts.")
+        jobs = [(s, part, parts, out, format) for s in seeds for part in range(parts)]
+        return sum(self._pool.imap_unordered(_render, jobs))
+
+    def close(self) -> None:
+        """
+        Wait for all jobs to finish and stop workers.
+        """
+        self._pool.close()
+        self._pool.join()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Render games into image sequences without displaying them.")
+    parser.add_argument("out", type=Path, help="The output directory.")
+    parser.add_argument("--config", type=Path, default=DEFAULT_PATH, help="The configuration file.")
+    parser.add_argument("--games", type=int, default=10, help="The number of games.")
+    parser.add_argument("--seed", type=int, default=0, help="The random seed of the first game.")
+    parser.add_argument("--processes", type=int, default=None, help="The number of worker processes.")
+    parser.add_argument("--parts", type=int, default=1,
+                        help="The number of frame ranges each game is split into across workers.")
+    parser.add_argument("--zoom", type=float, default=1, help="The zoom level of tiles.")
+    parser.add_argument("--format", choices=Renderer.FORMATS, default="png", help="The image format.")
+    args = parser.parse_args()
+
+    cfg = Config.load(args.config)
+    begin = time.perf_counter()
+    with RenderPool(args.processes, args.config, args.zoom) as pool:
+        frames = pool.render(range(args.seed, args.seed + args.games), args.out, args.parts, args.format)
+    end = time.perf_counter()
+
+    print(f"Frames: {frames}, Total: {end - begin:.2f} s, Real Time: {frames / cfg.fps:.2f} s")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger(__name__)
+
+    try:
+        main()
+    except SystemExit:
+        raise
+    except BaseException as err:
+        logger.exception(err)
+        sys.exit(1)
@@ -0,0 +1,455 @@
+import argparse
+import asyncio
+import base64
+import hashlib
+import logging
+import struct
+import sys
+from collections.abc import Sequence
+from concurrent.futures import Executor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+import game.autotune as autotune
+from config import Config, DEFAULT_PATH
+from game.action import Action
+from game.events import Event, EventType
+from game.map import Map, Status
+from game.role import Enemy
+from simulation import create_map, create_roles, next_step
+
+logger = logging.getLogger(__name__)
+
+# The message types sent by clients.
+CREATE: int = 1
+WATCH: int = 2
+ACTION: int = 3
+
+# The message types sent by the server.
+SNAPSHOT: int = 1
+DELTA: int = 2
+ERROR: int = 3
+
+_TYPE = struct.Struct("<B")
+
+# Create a game: whether the creator controls the agent.
+_CREATE = struct.Struct("<BB")
+
+# Watch a game: the game ID.
+_WATCH = struct.Struct("<BI")
+
+# Send an agent action: the action value.
+_ACTION = struct.Struct("<BB")
+
+# A full state: the game ID, width, height, agent position and enemy position,
+# followed by the terrains and whether the enemy has discovered each position, both in row-major order.
+_SNAPSHOT = struct.Struct("<BIIIIIII")
+
+# A state change: the game ID, step, agent position, enemy position, whether the game is end
+# and the number of positions newly discovered by the enemy, followed by these positions.
+_DELTA = struct.Struct("<BIIIIIIBI")
+_POS = struct.Struct("<II")
+
+# The translation of the bytes of a revealed layer into whether each position has been discovered.
+_REVEALED: bytes = bytes((0,)) + bytes((1,)) * 255
+
+# The length prefix of messages over TCP.
+_LENGTH = struct.Struct("<I")
+
+# The maximum size of a message sent by clients.
+_MAX_MESSAGE: int = 1024
+
+# The maximum number of bytes waiting to be sent to a client before it is dropped as too slow.
+_MAX_BUFFER: int = 1 << 22
+
+_WS_GUID: bytes = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+class Connection:
+    """
+    A client connection exchanging binary messages, either length-prefixed over TCP or in WebSocket frames.
+    """
+    def __init__(self, reader: 'asyncio.StreamReader | _Prefixed', writer: asyncio.StreamWriter,
+                 websocket: bool) -> None:
+        self._reader: asyncio.StreamReader | _Prefixed = reader
+        self._writer: asyncio.StreamWriter = writer
+        self._websocket: bool = websocket
+
+    @staticmethod
+    async def accept(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> 'Connection':
+        """
+        Accept a client. A WebSocket handshake is detected by its HTTP request line.
+        """
+        head = await reader.readexactly(4)
+        if head != b"GET ":
+            return Connection(_Prefixed(head, reader), writer, websocket=False)
+
+        request = head + await reader.readuntil(b"\r\n\r\n")
+        key = None
+        for line in request.split(b"\r\n")[1:]:
+            name, _, value = line.partition(b":")
+            if name.strip().lower() == b"sec-websocket-key":
+                key = value.strip()
+        if key is None:
+            writer.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n")
+            raise ConnectionError("Invalid WebSocket handshake.")
+
+        accept = base64.b64encode(hashlib.sha1(key + _WS_GUID).digest())
+        writer.write(b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                     b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n")
+        return Connection(reader, writer, websocket=True)
+
+    async def recv(self) -> Optional[bytes]:
+        """
+        Receive a message. `None` means the client has closed the connection.
+        """
+        try:
+            if self._websocket:
+                return await self._recv_frame()
+            size = _LENGTH.unpack(await self._reader.readexactly(_LENGTH.size))[0]
+            if size > _MAX_MESSAGE:
+                raise ConnectionError("The message is too large.")
+            return await self._reader.readexactly(size)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            return None
+
+    async def _recv_frame(self) -> Optional[bytes]:
+        while True:
+            fin_op, size = await self._reader.readexactly(2)
+            opcode = fin_op & 0x0F
+            masked = size & 0x80
+            size &= 0x7F
+            if size == 126:
+                size = struct.unpack(">H", await self._reader.readexactly(2))[0]
+            elif size == 127:
+                size = struct.unpack(">Q", await self._reader.readexactly(8))[0]
+            if size > _MAX_MESSAGE or not fin_op & 0x80 or not masked:
+                # Fragmented or unmasked messages are not supported.
+                raise ConnectionError("Unsupported WebSocket frame.")
+
+            mask = await self._reader.readexactly(4)
+            payload = bytes(b ^ mask[i % 4] for i, b in enumerate(await self._reader.readexactly(size)))
+            if opcode in (0x1, 0x2):
+                return payload
+            elif opcode == 0x8:
+                return None
+            elif opcode == 0x9:
+                self._write_frame(0xA, payload)
+
+    def send(self, message: bytes) -> bool:
+        """
+        Send a message without waiting.
+
+        -- RETURN --
+        Whether the client keeps up. A client whose buffer has grown too large should be dropped.
+        """
+        if self._writer.is_closing():
+            return False
+        if self._websocket:
+            self._write_frame(0x2, message)
+        else:
+            self._writer.write(_LENGTH.pack(len(message)) + message)
+        return self._writer.transport.get_write_buffer_size() <= _MAX_BUFFER
+
+    def _write_frame(self, opcode: int, payload: bytes) -> None:
+        if len(payload) < 126:
+            head = struct.pack(">BB", 0x80 | opcode, len(payload))
+        elif len(payload) < 1 << 16:
+            head = struct.pack(">BBH", 0x80 | opcode, 126, len(payload))
+        else:
+            head = struct.pack(">BBQ", 0x80 | opcode, 127, len(payload))
+        self._writer.write(head + payload)
+
+    def error(self, msg: str) -> None:
+        """
+        Send an error message.
+        """
+        self.send(_TYPE.pack(ERROR) + msg.encode("utf-8"))
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+class _Prefixed:
+    """
+    A stream reader whose first bytes have been read ahead.
+    """
+    def __init__(self, head: bytes, reader: asyncio.StreamReader) -> None:
+        self._head: bytes = head
+        self._reader: asyncio.StreamReader = reader
+
+    async def readexactly(self, n: int) -> bytes:
+        if len(self._head) == 0:
+            return await self._reader.readexactly(n)
+        head, self._head = self._head[:n], self._head[n:]
+        return head + (await self._reader.readexactly(n - len(head)) if n > len(head) else b"")
+
+
+class Session:
+    """
+    A game with its own status, map and roles, played in the event loop.
+    Steps run in an executor, so a slow path-finding search does not stall other sessions.
+    """
+    def __init__(self, id: int, cfg: Config) -> None:
+        """
+        The constructor.
+
+        -- PARAMETERS --
+        id: The game ID.
+        cfg: The configuration.
+        """
+        self._id: int = id
+        self._status: Status = Status(cfg)
+        self._map: Map = create_map(cfg)
+        if not self._map.dense:
+            raise ValueError("Games can only be served on dense maps.")
+        create_roles(self._status, self._map)
+
+        # The positions discovered by the enemy in the current step.
+        self._reveals: list[tuple[int, int]] = []
+        self._status.events.subscribe(self._on_events, (EventType.REVEALED,))
+
+        self._move_enemy: bool = False
+        self._watchers: set[Connection] = set()
+
+        # Whether a step is running in the executor, and the clients waiting for their snapshots until it finishes.
+        # A snapshot taken during a step could mix its changes, which would also be sent again in its delta.
+        self._stepping: bool = False
+        self._joining: list[Connection] = []
+
+        # The client controlling the agent. The agent chooses actions by itself if there is none.
+        self._controller: Optional[Connection] = None
+        self._action: Optional[Action] = None
+        self._action_ready: asyncio.Event = asyncio.Event()
+
+    @property
+    def id(self) -> int:
+        return self._id
+
+    def watch(self, conn: Connection) -> None:
+        """
+        Send the full state to a client and then its changes after each step.
+        If a step is running, the state is sent after it.
+        """
+        if self._stepping:
+            self._joining.append(conn)
+            return
+        self._watchers.add(conn)
+        if not conn.send(self._snapshot()):
+            self.leave(conn)
+
+    def control(self, conn: Connection) -> None:
+        """
+        Let a client control the agent. The game waits for its action before each step.
+        """
+        self._controller = conn
+
+    def act(self, conn: Connection, action: Action) -> bool:
+        """
+        Receive the next action if the client is the controller.
+        """
+        if conn is not self._controller:
+            return False
+        self._action = action
+        self._action_ready.set()
+        return True
+
+    def leave(self, conn: Connection) -> None:
+        """
+        Remove a disconnected client.
+        """
+        self._watchers.discard(conn)
+        if conn in self._joining:
+            self._joining.remove(conn)
+        if conn is self._controller:
+            self._controller = None
+            self._action_ready.set()
+
+    async def run(self, executor: Executor, interval: float) -> None:
+        """
+        Play the game until it ends.
+
+        -- PARAMETERS --
+        executor: The executor running steps.
+        interval: The minimum number of seconds between steps when the agent is not controlled.
+        """
+        loop = asyncio.get_running_loop()
+        while not self._status.game_end:
+            if self._controller is not None:
+                await self._action_ready.wait()
+                self._action_ready.clear()
+            else:
+                await asyncio.sleep(interval)
+            action, self._action = self._action, None
+            self._stepping = True
+            try:
+                delta = await loop.run_in_executor(executor, self._step, action)
+            finally:
+                self._stepping = False
+            for conn in list(self._watchers):
+                if not conn.send(delta):
+                    logger.warning(f"A slow client watching game {self._id} is dropped.")
+                    self.leave(conn)
+                    conn.close()
+
+            joining, self._joining = self._joining, []
+            for conn in joining:
+                self.watch(conn)
+
+    def _step(self, action: Optional[Action]) -> bytes:
+        """
+        Move roles by one step and get the state change.
+        """
+        enemy = self._status.enemy
+        self._reveals.clear()
+        next_step(self._status, self._move_enemy, action)
+        self._move_enemy = not self._move_enemy
+        agent_pos = self._status.agent.pos
+        return _DELTA.pack(DELTA, self._id, self._status.steps, *agent_pos, *enemy.pos, self._status.game_end,
+                           len(self._reveals)) + b"".join(_POS.pack(*pos) for pos in self._reveals)
+
+    def _on_events(self, step: int, events: Sequence[Event]) -> None:
+        for event in events:
+            if event.role == Enemy.name():
+                self._reveals.extend(event.cells)
+
+    def _snapshot(self) -> bytes:
+        map, enemy = self._map, self._status.enemy
+        layer = enemy.revealed_layer
+        # The layer also flags scanned positions, so every nonzero byte becomes 1.
+        revealed = bytes(layer.cells).translate(_REVEALED) if layer is not None else b"\x01" * len(map.terrains)
+        return _SNAPSHOT.pack(SNAPSHOT, self._id, map.width, map.height, *self._status.agent.pos, *enemy.pos) \
+            + bytes(map.terrains) + revealed
+
+
+class GameServer:
+    """
+    A server running many independent games in one event loop.
+    Clients can create games, control their agents or watch them.
+    """
+    def __init__(self, cfg: Config, executor: Executor, interval: Optional[float] = None) -> None:
+        """
+        The constructor.
+
+        -- PARAMETERS --
+        cfg: The configuration.
+        executor: The executor running steps.
+        interval: The minimum number of seconds between steps of uncontrolled games. `None` means `1 / fps`.
+        """
+        self._cfg: Config = cfg
+        self._executor: Executor = executor
+        self._interval: float = interval if interval is not None else 1 / cfg.fps
+        self._sessions: dict[int, Session] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._next_id: int = 1
+
+    @property
+    def sessions(self) -> int:
+        """
+        The number of running games.
+        """
+        return len(self._sessions)
+
+    async def create(self) -> Session:
+        """
+        Create and start a game.
+        The game is created in the executor, since generating its map and choosing a planner may take long.
+        """
+        id = self._next_id
+        self._next_id += 1
+        session = await asyncio.get_running_loop().run_in_executor(self._executor, Session, id, self._cfg)
+        self._sessions[session.id] = session
+        task = asyncio.create_task(session.run(self._executor, self._interval))
+        self._tasks.add(task)
+        task.add_done_callback(lambda t: self._finish(session, t))
+        return session
+
+    def _finish(self, session: Session, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        del self._sessions[session.id]
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Game {session.id} failed.", exc_info=task.exception())
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Serve a client until it disconnects.
+        """
+        try:
+            conn = await Connection.accept(reader, writer)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            writer.close()
+            return
+
+        joined: list[Session] = []
+        try:
+            while (message := await conn.recv()) is not None:
+                await self._dispatch(conn, message, joined)
+        finally:
+            for session in joined:
+                session.leave(conn)
+            conn.close()
+
+    async def _dispatch(self, conn: Connection, message: bytes, joined: list[Session]) -> None:
+        if len(message) == 0:
+            conn.error("Empty message.")
+            return
+
+        type = message[0]
+        try:
+            if type == CREATE:
+                control = _CREATE.unpack(message)[1]
+                session = await self.create()
+                if control:
+                    session.control(conn)
+                session.watch(conn)
+                joined.append(session)
+            elif type == WATCH:
+                id = _WATCH.unpack(message)[1]
+                if id not in self._sessions:
+                    conn.error(f"Game {id} does not exist.")
+                    return
+                self._sessions[id].watch(conn)
+                joined.append(self._sessions[id])
+            elif type == ACTION:
+                action = Action(_ACTION.unpack(message)[1])
+                if not any([session.act(conn, action) for session in joined]):
+                    conn.error("No agent is controlled by the client.")
+            else:
+                conn.error(f"Invalid message type {type}.")
+        except (struct.error, ValueError) as err:
+            conn.error(str(err))
+
+
+async def serve(cfg: Config, host: str, port: int, threads: Optional[int] = None,
+                interval: Optional[float] = None) -> None:
+    # Calibrate planners before serving, so the first game does not wait for it.
+    autotune.prepare(cfg)
+    with ThreadPoolExecutor(threads) as executor:
+        server = GameServer(cfg, executor, interval)
+        async with await asyncio.start_server(server.handle, host, port) as tcp:
+            logger.info(f"Serving on {host}:{port}.")
+            await tcp.serve_forever()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve games to TCP and WebSocket clients.")
+    parser.add_argument("--config", type=Path, default=DEFAULT_PATH, help="The configuration file.")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="The host address.")
+    parser.add_argument("--port", type=int, default=8765, help="The port.")
+    parser.add_argument("--threads", type=int, default=None, help="The number of threads running steps.")
+    parser.add_argument("--interval", type=float, default=None,
+                        help="The number of seconds between steps of uncontrolled games. The default is 1 / fps.")
+    args = parser.parse_args()
+    asyncio.run(serve(Config.load(args.config), args.host, args.port, args.threads, args.interval))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    try:
+        main()
+    except (SystemExit, KeyboardInterrupt):
+        pass
+    except BaseException as err:
+        logger.exception(err)
+        sys.exit(1)
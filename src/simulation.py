@@ -0,0 +1,191 @@
+from collections.abc import Sequence
+from random import randint, seed
+from typing import NamedTuple, Optional
+
+import game.autotune as autotune
+import game.mapfile as mapfile
+from config import Config
+from game.action import Action
+from game.chunked import ChunkedMap
+from game.map import Map, Status
+from game.role import Agent, Enemy
+
+
+class GameResult(NamedTuple):
+    """
+    The result of a finished game.
+    """
+    seed: int
+    score: int
+    steps: int
+    good_steps: int
+
+    # Whether the game ended because the agent was stuck rather than reaching the maximum number of steps.
+    stuck: bool
+
+    # The number of path-finding searches by the enemy and positions expanded by them.
+    searches: int = 0
+    expanded: int = 0
+
+
+class Frame(NamedTuple):
+    """
+    The state of a recorded game after a step.
+    """
+    agent: tuple[int, int]
+    enemy: tuple[int, int]
+
+    # The planned path of the enemy.
+    path: tuple[tuple[int, int], ...]
+
+    # The positions discovered by the enemy in this step.
+    reveals: tuple[tuple[int, int], ...]
+
+    game_end: bool
+
+
+class Recording(NamedTuple):
+    """
+    A recorded game, which can be rendered without playing it again.
+    The first frame is the initial state and its reveals are all positions the enemy knows at the beginning.
+    """
+    seed: int
+    width: int
+    height: int
+    terrains: bytes
+    frames: list[Frame]
+
+
+def create_map(cfg: Config) -> Map:
+    map = _generate_map(cfg)
+    if autotune.uses(cfg):
+        # Choose the planner of the enemy for this map, calibrating planners first if this host has not.
+        autotune.choose(cfg, map)
+    return map
+
+
+def _generate_map(cfg: Config) -> Map:
+    if cfg.map_path is not None:
+        # Load a random map file instead of generating one.
+        paths = mapfile.files(cfg.map_path)
+        map = mapfile.load(paths[randint(0, len(paths) - 1)], cfg)
+        if map.blank_count() < 2:
+            raise ValueError("A map should contain at least 2 blanks.")
+        return map
+
+    if cfg.chunked_map is not None:
+        # Generate chunks lazily instead of the whole map.
+        chunked = cfg.chunked_map
+        map = ChunkedMap(chunked["size"], chunked["size"], cfg, chunked["chunkSize"], chunked["seed"],
+                         chunked["maxMemory"] * 2 ** 20)
+        if map.blank_count() < 2:
+            raise ValueError("The spawn area should contain at least 2 blanks.")
+        return map
+
+    map_size = cfg.map_size
+    if not 1 < map_size["width"]["min"] <= map_size["width"]["max"] \
+       or not 1 < map_size["height"]["min"] <= map_size["height"]["max"]:
+        raise ValueError("Invalid size of map.")
+
+    curr_try, max_try = 0, 100
+    while curr_try < max_try:
+        width = randint(map_size["width"]["min"], map_size["width"]["max"])
+        height = randint(map_size["height"]["min"], map_size["height"]["max"])
+        map = Map(width, height, cfg)
+        if map.blank_count() >= 2:
+            return map
+        else:
+            curr_try += 1
+    raise RuntimeError(f"Failed to create a map containing at least 2 blanks within {max_try} times.")
+
+
+def create_roles(status: Status, map: Map) -> None:
+    assert map.blank_count() >= 2
+    begin, end = map.spawn_area()
+    taken = set()
+
+    def random_blank() -> tuple[int, int]:
+        # Sample random positions first, so large maps need not list all blanks.
+        for _ in range(100):
+            pos = randint(begin[0], end[0] - 1), randint(begin[1], end[1] - 1)
+            if not map.wall(*pos) and pos not in taken:
+                break
+        else:
+            blanks = [pos for pos in map.blanks() if pos not in taken]
+            pos = blanks[randint(0, len(blanks) - 1)]
+        taken.add(pos)
+        return pos
+
+    agent = Agent(status, map, random_blank())
+    status.agent = agent
+    enemy = Enemy(status, map, random_blank())
+    status.enemy = enemy
+
+
+def next_step(status: Status, move_enemy: bool, agent_action: Optional[Action] = None) -> None:
+    """
+    Move roles by one step. The enemy only moves when `move_enemy` is `True`.
+    The agent takes `agent_action` if it is provided, otherwise it chooses an action by itself.
+    """
+    status.agent.move(agent_action)
+    if move_enemy:
+        status.enemy.move()
+    status.new_step()
+    # The game will end if the agent is stuck or the number of steps reaches its maximum.
+    if status.agent.stuck() or status.steps == status.cfg.max_steps:
+        status.end_game()
+
+
+def new_game(cfg: Config, maps: Optional[Sequence[Map]] = None) -> Status:
+    """
+    Create a game with random roles on a random map.
+    The map is chosen from `maps` if it is provided, otherwise it is generated.
+    """
+    status = Status(cfg)
+    map = maps[randint(0, len(maps) - 1)] if maps else create_map(cfg)
+    create_roles(status, map)
+    return status
+
+
+def play(status: Status) -> Status:
+    """
+    Play a game until it ends without displaying it.
+    """
+    move_enemy = False
+    while not status.game_end:
+        next_step(status, move_enemy)
+        move_enemy = not move_enemy
+    return status
+
+
+def play_seed(cfg: Config, game_seed: int, maps: Optional[Sequence[Map]] = None) -> GameResult:
+    """
+    Play a game with a random seed, so it can be reproduced.
+    The map is chosen from `maps` if it is provided, otherwise it is generated.
+    """
+    seed(game_seed)
+    status = play(new_game(cfg, maps))
+    planner = status.enemy.planner
+    return GameResult(game_seed, status.score, status.steps, status.good_steps, status.agent.stuck(),
+                      planner.searches if planner else 0, planner.total_expanded if planner else 0)
+
+
+def record(cfg: Config, game_seed: int, maps: Optional[Sequence[Map]] = None) -> Recording:
+    """
+    Play a game with a random seed like `play_seed` and record its frames.
+    The map should be dense.
+    """
+    seed(game_seed)
+    status = new_game(cfg, maps)
+    agent, enemy = status.agent, status.enemy
+    map = enemy.map
+    reveals = tuple((x, y) for x in range(map.width) for y in range(map.height) if enemy.revealed((x, y)))
+    frames = [Frame(agent.pos, enemy.pos, tuple(enemy.path), reveals, status.game_end)]
+
+    move_enemy = False
+    while not status.game_end:
+        next_step(status, move_enemy)
+        reveals = tuple(enemy.new_reveals) if move_enemy else ()
+        frames.append(Frame(agent.pos, enemy.pos, tuple(enemy.path), reveals, status.game_end))
+        move_enemy = not move_enemy
+    return Recording(game_seed, map.width, map.height, bytes(map.terrains), frames)
@@ -0,0 +1,293 @@
+import json
+import math
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+
+from config import Config
+from simulation import GameResult
+
+
+class Welford:
+    """
+    The online mean and variance of a stream of numbers, using Welford's algorithm.
+    Summaries of different streams can be merged, so each process can summarize its own games.
+    """
+    __slots__ = ("count", "mean", "_m2")
+
+    def __init__(self) -> None:
+        self.count: int = 0
+        self.mean: float = 0.0
+
+        # The sum of squared differences from the mean.
+        self._m2: float = 0.0
+
+    @property
+    def variance(self) -> float:
+        """
+        The sample variance.
+        """
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def stdev(self) -> float:
+        return math.sqrt(self.variance)
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+    def merge(self, other: 'Welford') -> None:
+        """
+        Merge another summary, using the parallel algorithm of Chan et al.
+        """
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self._m2 += other._m2 + delta * delta * self.count * other.count / count
+        self.count = count
+
+
+class Histogram:
+    """
+    The counts of values in fixed-width buckets starting from zero, used to estimate quantiles.
+    Values beyond the last bucket are counted in it. Histograms with the same buckets can be merged.
+    """
+    __slots__ = ("_width", "_counts")
+
+    def __init__(self, width: int, buckets: int) -> None:
+        """
+        The constructor.
+
+        -- PARAMETERS --
+        width: The width of a bucket.
+        buckets: The number of buckets.
+        """
+        assert width > 0 and buckets > 0
+        self._width: int = width
+        self._counts: list[int] = [0] * buckets
+
+    def add(self, value: int) -> None:
+        self._counts[min(max(value, 0) // self._width, len(self._counts) - 1)] += 1
+
+    def merge(self, other: 'Histogram') -> None:
+        if self._width != other._width or len(self._counts) != len(other._counts):
+            raise ValueError("Histograms with different buckets cannot be merged.")
+        for i, count in enumerate(other._counts):
+            self._counts[i] += count
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate a quantile by interpolating in its bucket. It is exact when buckets have a width of one.
+        """
+        total = sum(self._counts)
+        if total == 0:
+            return math.nan
+        target = q * total
+        seen = 0
+        for i, count in enumerate(self._counts):
+            if count > 0 and seen + count >= target:
+                return i * self._width + (self._width - 1) * (target - seen) / count
+            seen += count
+        return (len(self._counts) - 1) * self._width
+
+
+class GameStats:
+    """
+    The summaries of games played with the same configuration.
+    """
+    # The summarized values of a game result.
+    FIELDS: tuple[str, ...] = ("score", "steps", "good_steps", "searches", "expanded")
+
+    # The quantiles reported for scores and steps.
+    QUANTILES: tuple[float, ...] = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+    __slots__ = ("games", "stuck", "summaries", "scores", "steps")
+
+    def __init__(self, max_steps: int) -> None:
+        """
+        The constructor.
+
+        -- PARAMETERS --
+        max_steps: The maximum number of steps, which determines the buckets of steps.
+        """
+        self.games: int = 0
+
+        # The number of games ending because the agent was stuck rather than reaching the maximum number of steps.
+        self.stuck: int = 0
+
+        self.summaries: dict[str, Welford] = {name: Welford() for name in self.FIELDS}
+
+        # Scores are between 0 and 100.
+        self.scores: Histogram = Histogram(1, 101)
+        self.steps: Histogram = Histogram(max(math.ceil(max_steps / 100), 1), 101)
+
+    def add(self, result: GameResult) -> None:
+        self.games += 1
+        self.stuck += result.stuck
+        for name in self.FIELDS:
+            self.summaries[name].add(getattr(result, name))
+        self.scores.add(result.score)
+        self.steps.add(result.steps)
+
+    def merge(self, other: 'GameStats') -> None:
+        self.games += other.games
+        self.stuck += other.stuck
+        for name in self.FIELDS:
+            self.summaries[name].merge(other.summaries[name])
+        self.scores.merge(other.scores)
+        self.steps.merge(other.steps)
+
+    def to_dict(self) -> dict:
+        return {
+            "games": self.games,
+            "stuck": self.stuck,
+            "maxSteps": self.games - self.stuck,
+            **{name: {"mean": self.summaries[name].mean, "stdev": self.summaries[name].stdev} for name in self.FIELDS},
+            "scoreQuantiles": {str(q): self.scores.quantile(q) for q in self.QUANTILES},
+            "stepQuantiles": {str(q): self.steps.quantile(q) for q in self.QUANTILES}
+        }
+
+
+def config_key(cfg: Config) -> str:
+    """
+    Get a key of the strategy weights of a configuration, which groups game statistics.
+    """
+    return ";".join(f"{role}:" + ",".join(f"{s}={w:g}" for s, w in cfg.strategies(role)) for role in ("agent", "enemy"))
+
+
+class Aggregator:
+    """
+    The statistics of games grouped by their strategy weights.
+    Aggregators of different processes can be merged, so only summaries are sent between processes.
+    """
+    def __init__(self) -> None:
+        self._stats: dict[str, GameStats] = {}
+
+    @property
+    def games(self) -> int:
+        return sum(stats.games for stats in self._stats.values())
+
+    def add(self, cfg: Config, result: GameResult) -> None:
+        """
+        Add the result of a game played with a configuration.
+        """
+        key = config_key(cfg)
+        if key not in self._stats:
+            self._stats[key] = GameStats(cfg.max_steps)
+        self._stats[key].add(result)
+
+    def merge(self, other: 'Aggregator') -> None:
+        for key, stats in other._stats.items():
+            if key in self._stats:
+                self._stats[key].merge(stats)
+            else:
+                self._stats[key] = stats
+
+    def to_dict(self) -> dict:
+        return {key: stats.to_dict() for key, stats in self._stats.items()}
+
+    def flush(self, path: Path) -> None:
+        """
+        Write the statistics into a JSON file. The file is replaced atomically, so readers never see a partial one.
+        """
+        temp = path.with_name(path.name + ".tmp")
+        with temp.open("w", encoding="utf-8") as file:
+            json.dump(self.to_dict(), file, indent=4)
+        os.replace(temp, path)
+
+    def metrics(self) -> str:
+        """
+        Format the statistics as plain-text metrics, one `name{config="key"} value` per line.
+        """
+        lines = []
+        for key, stats in self._stats.items():
+            label = f'{{config="{key}"}}'
+            lines.append(f"chase_games{label} {stats.games}")
+            lines.append(f"chase_stuck_games{label} {stats.stuck}")
+            for name in GameStats.FIELDS:
+                lines.append(f"chase_{name}_mean{label} {stats.summaries[name].mean}")
+                lines.append(f"chase_{name}_stdev{label} {stats.summaries[name].stdev}")
+            for q in GameStats.QUANTILES:
+                lines.append(f'chase_score{{config="{key}",quantile="{q}"}} {stats.scores.quantile(q)}')
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """
+    A local HTTP server of plain-text metrics, running in a background thread.
+    """
+    def __init__(self, port: int, host: str = "127.0.0.1") -> None:
+        self._text: bytes = b""
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                text = server._text
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; charset=utf-8")
+                self.send_header("Content-Length", str(len(text)))
+                self.end_headers()
+                self.wfile.write(text)
+
+            def log_message(self, *args) -> None:
+                pass
+
+        self._http: ThreadingHTTPServer = ThreadingHTTPServer((host, port), Handler)
+        self._thread: threading.Thread = threading.Thread(target=self._http.serve_forever, daemon=True)
+        self._thread.start()
+
+    @property
+    def port(self) -> int:
+        return self._http.server_address[1]
+
+    def update(self, text: str) -> None:
+        """
+        Replace the served metrics.
+        """
+        self._text = text.encode("utf-8")
+
+    def close(self) -> None:
+        self._http.shutdown()
+        self._http.server_close()
+
+
+class Reporter:
+    """
+    Merge partial statistics and publish them periodically to a file and a metrics server.
+    """
+    def __init__(self, path: Optional[Path], interval: float, metrics: Optional[MetricsServer] = None) -> None:
+        """
+        The constructor.
+
+        -- PARAMETERS --
+        path: The JSON file that statistics are flushed to. `None` means they are not saved.
+        interval: The minimum number of seconds between flushes.
+        metrics: The metrics server.
+        """
+        self.stats: Aggregator = Aggregator()
+        self._path: Optional[Path] = path
+        self._interval: float = interval
+        self._metrics: Optional[MetricsServer] = metrics
+        self._last: float = -math.inf
+
+    def merge(self, partial: Aggregator, now: float) -> None:
+        """
+        Merge partial statistics and publish them if the interval has passed.
+        """
+        self.stats.merge(partial)
+        if now - self._last >= self._interval:
+            self.publish()
+            self._last = now
+
+    def publish(self) -> None:
+        if self._path is not None:
+            self.stats.flush(self._path)
+        if self._metrics is not None:
+            self._metrics.update(self.stats.metrics())